@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Compare the bytes written per task when finalizing mp4 output.
+
+    before:      ffmpeg with -movflags +faststart, followed by the interleave plugin (MP4Box -inter)
+    faststart:   ffmpeg with -movflags +faststart only, i.e. without the interleave plugin
+    single-pass: ffmpeg reserving space for the moov in front (-moov_size) and interleaving the chunks
+                 (-chunk_duration), as done by the executor
+
+The numbers are taken from /proc/self/io, which includes the I/O of all child processes that have been waited for.
+Requires ffmpeg on the PATH, the MP4Box variant is skipped if MP4Box is not installed.
+
+Usage: benchmark_mp4_finalization.py INPUT [--param 500] [--moov-size BYTES] [--ffmpeg-args "-c copy"]
+"""
+import argparse
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import time
+
+
+def read_io() -> dict:
+    with open('/proc/self/io') as f:
+        return {key: int(value) for key, value in (line.split(': ') for line in f)}
+
+
+def run(commands: list[list[str]]) -> dict:
+    before = read_io()
+    t0 = time.time()
+    for command in commands:
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    after = read_io()
+    return {
+        'wchar': after['wchar'] - before['wchar'],
+        'write_bytes': after['write_bytes'] - before['write_bytes'],
+        'seconds': time.time() - t0,
+    }
+
+
+def ffmpeg_command(path_in: str, path_out: str, ffmpeg_args: list[str], faststart=False, moov_size=0,
+                   param=0) -> list[str]:
+    command = ['ffmpeg', '-hide_banner', '-y', '-i', path_in, '-map', '0', '-map_metadata', '-1']
+    command += ffmpeg_args
+    if faststart:
+        command += ['-movflags', '+faststart']
+    if moov_size:
+        command += ['-chunk_duration', str(param * 1000), '-moov_size', str(moov_size)]
+    return command + [path_out]
+
+
+def mp4box_command(path_in: str, path_out: str, param: int) -> list[str]:
+    return ['MP4Box', '-inter', str(param), path_in, '-out', path_out]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bytes written per task for mp4 finalization')
+    parser.add_argument('input')
+    parser.add_argument('--param', type=int, default=500, help='interleave parameter in ms')
+    parser.add_argument('--moov-size', type=int, default=2 ** 20,
+                        help='bytes reserved for the moov, the executor estimates this from the probe')
+    parser.add_argument('--ffmpeg-args', default='-c copy', help='stream mapping/encoding args for ffmpeg')
+    args = parser.parse_args()
+
+    ffmpeg_args = shlex.split(args.ffmpeg_args)
+
+    variants = {}
+    if shutil.which('MP4Box'):
+        variants['before'] = lambda step1, step2: [
+            ffmpeg_command(args.input, step1, ffmpeg_args, faststart=True),
+            mp4box_command(step1, step2, args.param),
+        ]
+    else:
+        print('MP4Box not found, skipping the variant with the interleave plugin')
+    variants['faststart'] = lambda step1, step2: [
+        ffmpeg_command(args.input, step2, ffmpeg_args, faststart=True),
+    ]
+    variants['single-pass'] = lambda step1, step2: [
+        ffmpeg_command(args.input, step2, ffmpeg_args, moov_size=args.moov_size, param=args.param),
+    ]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        step1 = os.path.join(tmp, 'step1.mp4')
+        step2 = os.path.join(tmp, 'step2.mp4')
+        for name, commands in variants.items():
+            results[name] = run(commands(step1, step2))
+            results[name]['size'] = os.path.getsize(step2)
+            for path in [step1, step2]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    for name, result in results.items():
+        size = result['size']
+        print(f"{name:>11}: output={size / 2 ** 20:.1f} MiB wchar={result['wchar'] / 2 ** 20:.1f} MiB "
+              f"({result['wchar'] / size:.2f}x) write_bytes={result['write_bytes'] / 2 ** 20:.1f} MiB "
+              f"time={result['seconds']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
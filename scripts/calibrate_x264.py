@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Measure single-threaded 1080p x264 throughput per preset on this machine.
+
+The result is read by kmarius_video_handler to choose presets. Run this inside the Unmanic container, so that the
+same ffmpeg build and CPU are measured.
+
+Usage: calibrate_x264.py [--frames 60] [--output PATH]
+"""
+import argparse
+import json
+import os
+import subprocess
+import time
+
+PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow']
+
+
+def get_home_dir() -> str:
+    '''Same as unmanic.libs.common.get_home_dir, HOME_DIR is set e.g. to /config in the docker image.'''
+    home_dir = os.environ.get('HOME_DIR')
+    if not home_dir:
+        return os.path.expanduser('~')
+    return os.path.abspath(os.path.expanduser(home_dir))
+
+
+# kmarius_video_handler reads it from encoders.CALIBRATION_PATH
+DEFAULT_OUTPUT = os.path.join(get_home_dir(), '.unmanic', 'userdata', 'kmarius_video_handler', 'x264_calibration.json')
+
+
+def measure(preset: str, frames: int) -> float:
+    command = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', 'testsrc2=size=1920x1080:rate=24',
+        '-frames:v', str(frames),
+        '-c:v', 'libx264', '-preset', preset, '-threads', '1', '-pix_fmt', 'yuv420p',
+        '-f', 'null', '-',
+    ]
+    t0 = time.perf_counter()
+    subprocess.run(command, check=True)
+    return frames / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate x264 presets for kmarius_video_handler')
+    parser.add_argument('--frames', type=int, default=60, help='frames to encode per preset')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    presets = {}
+    for preset in PRESETS:
+        fps = measure(preset, args.frames)
+        print(f'{preset:>10}: {fps:.1f} fps')
+        presets[preset] = round(fps, 2)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'created': int(time.time()),
+            'frames': args.frames,
+            'presets': presets,
+        }, f, indent=2)
+    print(f'Written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
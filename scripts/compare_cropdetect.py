@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Compare the sampled black bar detection of kmarius_healthcheck with the previous implementation, which ran
+cropdetect over one or two 30 second windows.
+
+Run it on a directory of test clips, ideally including letterboxed, pillarboxed, dark and short files. Prints the
+decision and time of both methods per file and the files where they disagree. Nothing is written to the metadata cache.
+Requires ffmpeg and ffprobe on the PATH, run it with the Python of the Unmanic installation.
+
+Usage: compare_cropdetect.py DIR
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'source'))
+
+from kmarius_healthcheck.lib import cropdetect  # noqa: E402
+
+EXTENSIONS = {'mkv', 'mp4', 'm4v', 'avi', 'webm', 'ts'}
+
+
+def probe(path: str) -> dict:
+    command = ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path]
+    return json.loads(subprocess.run(command, capture_output=True, check=True).stdout)
+
+
+def legacy_cropdetect(path: str, ss: int = None, t: int = None) -> tuple[int, int]:
+    command = ['ffmpeg']
+    if ss is not None:
+        command += ['-ss', str(ss)]
+    if t is not None:
+        command += ['-t', str(t)]
+    command += ['-i', path, '-vf', 'cropdetect', '-f', 'null', '-']
+    out = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT).stdout
+    crops = {}
+    for crop in re.compile(r'crop=-?(\d+):-?(\d+):\d+:\d+').findall(out.decode('utf-8')):
+        crops[crop] = crops.get(crop, 0) + 1
+    width, height = map(int, max(crops.items(), key=lambda x: x[1])[0])
+    return width, height
+
+
+def legacy_has_black_bars(path: str, probe_info: dict) -> bool:
+    duration = int(float(probe_info['format']['duration']))
+    video = next(s for s in probe_info['streams'] if s['codec_type'] == 'video')
+    width, height, thresh = video['width'], video['height'], 16
+    if duration > 60:
+        crop_width, crop_height = legacy_cropdetect(path, ss=30, t=30)
+        if not (width - crop_width > thresh or height - crop_height > thresh):
+            return False
+    ss, t = 300, 30
+    if duration < 330:
+        ss, t = max(0, duration - 30), None
+    crop_width, crop_height = legacy_cropdetect(path, ss=ss, t=t)
+    return width - crop_width > thresh or height - crop_height > thresh
+
+
+def sampled_has_black_bars(path: str, probe_info: dict) -> bool:
+    video = next(s for s in probe_info['streams'] if s['codec_type'] == 'video')
+    width, height = video['width'], video['height']
+    crop = cropdetect.detect(path, width, height, float(probe_info['format'].get('duration', 0)))
+    return crop is not None and cropdetect._has_bars(width, height, crop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sampled and windowed cropdetect')
+    parser.add_argument('dir')
+    args = parser.parse_args()
+
+    paths = sorted(os.path.join(root, name) for root, _, names in os.walk(args.dir) for name in names
+                   if os.path.splitext(name)[1][1:].lower() in EXTENSIONS)
+
+    mismatches = []
+    totals = {'legacy': 0.0, 'sampled': 0.0}
+    for path in paths:
+        probe_info = probe(path)
+        if not any(s['codec_type'] == 'video' for s in probe_info['streams']):
+            continue
+        results = {}
+        for name, func in [('legacy', legacy_has_black_bars), ('sampled', sampled_has_black_bars)]:
+            t0 = time.perf_counter()
+            results[name] = func(path, probe_info)
+            elapsed = time.perf_counter() - t0
+            totals[name] += elapsed
+            results[f'{name}_time'] = elapsed
+        print(f"legacy={results['legacy']!s:5} ({results['legacy_time']:5.1f}s) "
+              f"sampled={results['sampled']!s:5} ({results['sampled_time']:5.2f}s) {path}")
+        if results['legacy'] != results['sampled']:
+            mismatches.append(path)
+
+    print(f"\n{len(paths)} files, legacy {totals['legacy']:.1f}s, sampled {totals['sampled']:.1f}s")
+    for path in mismatches:
+        print(f'mismatch: {path}')
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
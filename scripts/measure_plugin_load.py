@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Measure the time and resident memory it takes to load the plugins, like Unmanic does when it starts.
+
+Every plugin module is imported in the same process, in order, and the wall time of the import and the growth of the
+resident set size are printed per plugin, along with the number of modules that were loaded. Run it once on a checkout
+before and once after a change and compare the totals, e.g. with a second checkout from `git worktree add`.
+
+Importing a plugin runs its module level code, which may create its databases in the Unmanic home directory. Run it
+with the Python of the Unmanic installation.
+
+Usage: measure_plugin_load.py [--source DIR] [PLUGIN ...]
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'source')
+
+
+def rss() -> int:
+    '''Resident set size of this process in bytes.'''
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure plugin load time and memory')
+    parser.add_argument('--source', default=SOURCE, help='directory containing the plugins')
+    parser.add_argument('plugins', nargs='*', help='plugins to load, in order, all by default')
+    args = parser.parse_args()
+
+    source = os.path.abspath(args.source)
+    sys.path.insert(0, source)
+    plugins = args.plugins or sorted(name for name in os.listdir(source)
+                                     if os.path.exists(os.path.join(source, name, 'plugin.py')))
+
+    start_rss = rss()
+    total_seconds = 0.0
+    print(f"{'plugin':32} {'ms':>8} {'RSS MiB':>8} {'modules':>8}")
+    for name in plugins:
+        modules = len(sys.modules)
+        before = rss()
+        t0 = time.perf_counter()
+        try:
+            importlib.import_module(f'{name}.plugin')
+        except Exception as e:
+            print(f'{name:32} failed: {e}')
+            continue
+        elapsed = time.perf_counter() - t0
+        total_seconds += elapsed
+        print(f'{name:32} {elapsed * 1000:8.1f} {(rss() - before) / 2 ** 20:8.2f} {len(sys.modules) - modules:8}')
+
+    print(f"{'total':32} {total_seconds * 1000:8.1f} {(rss() - start_rss) / 2 ** 20:8.2f}")
+
+
+if __name__ == '__main__':
+    main()
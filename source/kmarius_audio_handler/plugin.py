@@ -3,47 +3,42 @@ from typing import Optional
 from kmarius_audio_handler.lib import logger
 from kmarius_audio_handler.lib.types import FileTestData
 from kmarius_executor.lib import init_task_data
+from kmarius_executor.lib.plan import MappingPlan
+from kmarius_executor.lib.streams import StreamSummary
 
 
-def check_stream_lang(stream_info: dict, lang: str) -> bool:
-    return stream_info.get('tags', {}).get('language', '').lower() == lang
+def check_stream_lang(stream_info: StreamSummary, lang: str) -> bool:
+    return stream_info.language == lang
 
 
 # try to find an english language stream and return its index. If there are multiple, returns one with the most channels
-def search_eng_idx(streams: dict) -> Optional[int]:
+def search_eng_idx(streams: tuple[StreamSummary, ...]) -> Optional[int]:
     lang_idx = None
     lang_channels = None
     for idx, stream_info in enumerate(streams):
         if check_stream_lang(stream_info, 'eng'):
-            channels = stream_info.get('channels', 0)
+            channels = stream_info.channels or 0
             if lang_idx is None or channels > lang_channels:
                 lang_idx = idx
                 lang_channels = channels
     return lang_idx
 
 
-# convert non-aac streams to aac
-def audio_stream_mapping(stream_info: dict, idx: int) -> Optional[dict]:
-    codec_name = stream_info['codec_name']
+# convert streams that are neither aac nor opus to opus, returns True if the stream is encoded
+def plan_audio_stream(plan: MappingPlan, stream_info: StreamSummary, idx: int) -> bool:
+    codec_name = stream_info.codec_name
     if codec_name in ['aac', 'opus']:
-        return None
+        return False
     logger.info(f'converting audio stream {idx} from {codec_name}')
-    channels = int(stream_info.get('channels'))
+    channels = stream_info.channels or 2
     if channels > 6:
         bit_rate = '384k'
     elif channels == 6:
         bit_rate = '256k'
     else:
         bit_rate = '128k'
-    stream_encoding = [
-        f'-c:a:{idx}', 'libopus',
-        f'-b:a:{idx}', f'{bit_rate}',
-        f'-filter:a:{idx}', 'aformat=channel_layouts=7.1|5.1|stereo'
-    ]
-    return {
-        'stream_mapping': ['-map', f'0:a:{idx}'],
-        'stream_encoding': stream_encoding,
-    }
+    plan.encode('audio', idx, 'libopus', b=bit_rate, filter='aformat=channel_layouts=7.1|5.1|stereo')
+    return True
 
 
 def on_library_management_file_test(data: FileTestData, **kwargs):
@@ -51,8 +46,9 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
 
     # TODO: add functionality for foreign language films
 
+    plan: MappingPlan = task_data['plan']
     audio_streams = task_data['streams']['audio']
-    audio_mappings = {}
+    changed = False
 
     # try to find an english language stream
     eng_idx = search_eng_idx(audio_streams)
@@ -60,15 +56,10 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
     for idx, stream_info in enumerate(audio_streams):
         # remove non-eng streams if there is an english one
         if eng_idx is None or idx == eng_idx:
-            mapping = audio_stream_mapping(stream_info, idx)
+            changed |= plan_audio_stream(plan, stream_info, idx)
         else:
-            mapping = {
-                'stream_mapping': [],
-                'stream_encoding': [],
-            }
-        if mapping:
-            audio_mappings[idx] = mapping
+            plan.drop('audio', idx)
+            changed = True
 
-    task_data['mappings']['audio'] = audio_mappings
-    if audio_mappings:
+    if changed:
         task_data['add_file_to_pending_tasks'] = True
\ No newline at end of file
@@ -1,5 +1,4 @@
 import os
-from typing import override
 
 from mutagen.flac import FLAC
 from mutagen.mp3 import MP3
@@ -8,6 +7,7 @@ from unmanic.libs.unplugins.settings import PluginSettings
 
 from kmarius_audio_metadata_cleaner.lib import PLUGIN_ID
 from kmarius_audio_metadata_cleaner.lib.types import FileTestData, ProcessItemData
+from kmarius_library.lib import settings_cache
 
 
 class Settings(PluginSettings):
@@ -30,38 +30,16 @@ class Settings(PluginSettings):
             'description': 'Comma separated list of tags to remove',
         },
     }
-    _cache = {}
-
-    @override
-    def get_setting(self, key=None):
-        if not key:
-            return super().get_setting()
-        if key not in self._cache:
-            setting = super().get_setting(key)
-            tokens = setting.split(',')
-            tokens = [token.strip() for token in tokens]
-            tokens = [token for token in tokens if token != '']
-            self._cache[key] = tokens
-        return self._cache[key]
-
-
-_library_settings = {}
-
-
-def get_settings_object(library_id: int) -> Settings:
-    if library_id not in _library_settings:
-        _library_settings[library_id] = Settings(library_id=library_id)
-    return _library_settings[library_id]
 
 
 def on_library_management_file_test(data: FileTestData, **kwargs):
-    settings = get_settings_object(data.get('library_id'))
+    settings = settings_cache.get(Settings, data.get('library_id'))
 
     path = data.get('path')
     ext = os.path.splitext(path)[1][1:].lower()
 
     if ext == 'flac':
-        flac_tags = settings.get_setting('flac_tags')
+        flac_tags = settings.get_list('flac_tags')
 
         metadata = FLAC(path)
         for tag in flac_tags:
@@ -74,7 +52,7 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
                 return
 
     elif ext == 'mp3':
-        mp3_tags = settings.get_setting('mp3_tags')
+        mp3_tags = settings.get_list('mp3_tags')
 
         metadata = MP3(path)
         for tag in metadata.keys():
@@ -88,7 +66,7 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
                     return
 
     elif ext == 'm4a':
-        mp4_tags = settings.get_setting('mp4_tags')
+        mp4_tags = settings.get_list('mp4_tags')
 
         metadata = MP4(path)
         for tag in mp4_tags:
@@ -102,7 +80,7 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
 
 
 def on_worker_process(data: ProcessItemData, **kwargs):
-    settings = get_settings_object(data.get('library_id'))
+    settings = settings_cache.get(Settings, data.get('library_id'))
 
     path = data.get('file_in')
     ext = os.path.splitext(path)[1][1:].lower()
@@ -110,7 +88,7 @@ def on_worker_process(data: ProcessItemData, **kwargs):
     modified = False
     metadata = None
     if ext == 'flac':
-        flac_tags = settings.get_setting('flac_tags')
+        flac_tags = settings.get_list('flac_tags')
 
         metadata = FLAC(path)
         for tag in flac_tags:
@@ -119,7 +97,7 @@ def on_worker_process(data: ProcessItemData, **kwargs):
                 modified = True
 
     elif ext == 'mp3':
-        mp3_tags = settings.get_setting('mp3_tags')
+        mp3_tags = settings.get_list('mp3_tags')
 
         metadata = MP3(path)
         for tag in list(metadata.keys()):
@@ -130,7 +108,7 @@ def on_worker_process(data: ProcessItemData, **kwargs):
                     break
 
     elif ext == 'm4a':
-        mp4_tags = settings.get_setting('mp4_tags')
+        mp4_tags = settings.get_list('mp4_tags')
 
         metadata = MP4(path)
         for tag in mp4_tags:
@@ -1,10 +1,10 @@
 import time
 
-from unmanic.libs.unmodels import Libraries
 from unmanic.libs.unplugins.settings import PluginSettings
 
 from kmarius_debug.lib.types import *
 from kmarius_debug.lib import logger, PLUGIN_ID
+from kmarius_library.lib import settings_cache
 
 
 class Settings(PluginSettings):
@@ -33,14 +33,16 @@ def _reset_scan_info(library_id: int):
     }
 
 
-for lib in Libraries().select().where(Libraries.enable_remote_only == False):
-    _reset_scan_info(lib.id)
+def _get_scan_info(library_id: int) -> dict:
+    if library_id not in _scan_info:
+        _reset_scan_info(library_id)
+    return _scan_info[library_id]
 
 
 def on_library_management_file_test(data: FileTestData, **kwargs):
     library_id = data['library_id']
     path = data['path']
-    settings = Settings(library_id=library_id)
+    settings = settings_cache.get(Settings, library_id)
 
     logger.info(f'testing library_id={library_id} path={path}')
     slow_test_ms = int(settings.get_setting('slow_test_ms'))
@@ -49,14 +51,15 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
 
     force_process_first_n = int(settings.get_setting('force_process_first_n'))
     if force_process_first_n > 0:
-        if _scan_info[library_id]['num_forced'] < force_process_first_n:
+        scan_info = _get_scan_info(library_id)
+        if scan_info['num_forced'] < force_process_first_n:
             data['add_file_to_pending_tasks'] = True
             data['issues'].append({
                 'id': PLUGIN_ID,
                 'message': f'force processing: library_id={library_id} path={path}'
             })
-            _scan_info[library_id]['num_forced'] += 1
-            _scan_info[library_id]['forced'].add(path)
+            scan_info['num_forced'] += 1
+            scan_info['forced'].add(path)
         elif settings.get_setting('skip_after_force_n'):
             data['add_file_to_pending_tasks'] = False
             data['issues'].append({
@@ -69,12 +72,12 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
 def on_worker_process(data: ProcessItemData, **kwargs):
     library_id = data['library_id']
     path = data['file_in']
-    settings = Settings(library_id=library_id)
+    settings = settings_cache.get(Settings, library_id)
 
-    global _scan_info
-    if path in _scan_info[library_id]['forced']:
-        _scan_info[library_id]['num_processed'] += 1
-    if _scan_info[library_id]['num_processed'] >= _scan_info[library_id]['num_forced']:
+    scan_info = _get_scan_info(library_id)
+    if path in scan_info['forced']:
+        scan_info['num_processed'] += 1
+    if scan_info['num_processed'] >= scan_info['num_forced']:
         logger.info('all forced tasks processed, resetting counters')
         _reset_scan_info(library_id)
 
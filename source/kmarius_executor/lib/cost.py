@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+from typing import Optional
+
+from unmanic.libs import common
+
+from . import logger, PLUGIN_ID
+from .plan import MappingPlan, ENCODE
+from .streams import StreamSummary
+
+# Estimates the wall time of a task from its mapping plan, so that short tasks can be queued ahead of long encodes.
+# A task is split into parts: copying the file (bound by I/O) and one part per encoded stream (bound by the encoder).
+# Each part has a speed, which is corrected with the measured duration of finished tasks and stored in MODEL_PATH.
+
+MODEL_PATH = os.path.join(common.get_home_dir(), '.unmanic', 'userdata', PLUGIN_ID, 'cost_model.json')
+
+REFERENCE_PIXELS = 1920 * 1080
+REFERENCE_FPS = 24.0
+
+# copy: bytes per second. encoders: multiples of realtime for 1080p24 video, or for any audio/subtitle stream
+DEFAULT_SPEEDS = {
+    'copy': 100 * 2 ** 20,
+    'video': 1.0,
+    'video:libx264': 1.5,
+    'video:libx265': 0.3,
+    'video:libopenh264': 3.0,
+    'video:libsvtav1': 0.5,
+    'audio': 100.0,
+    'audio:libopus': 150.0,
+    'audio:flac': 200.0,
+    'subtitle': 1000.0,
+}
+
+# weight of a new measurement in the moving average
+ALPHA = 0.2
+
+# tasks estimated to take longer than this many minutes are all queued alike, see priority_score
+MAX_PRIORITY_PENALTY = 60
+
+_lock = threading.Lock()
+_speeds: Optional[dict[str, float]] = None
+_started: dict[tuple[int, str], dict[str, float]] = {}
+
+
+def _load() -> dict[str, float]:
+    global _speeds
+    if _speeds is None:
+        _speeds = {}
+        try:
+            with open(MODEL_PATH) as f:
+                _speeds = {key: float(speed) for key, speed in json.load(f).items()}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            logger.error(f'Could not read {MODEL_PATH}: {e}')
+    return _speeds
+
+
+def _save(speeds: dict[str, float]):
+    os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
+    tmp = f'{MODEL_PATH}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(speeds, f, indent=2)
+    os.replace(tmp, MODEL_PATH)
+
+
+def get_speed(key: str) -> float:
+    '''Calibrated speed of a part, falling back to the defaults of the part and then of its stream type.'''
+    with _lock:
+        speeds = _load()
+        if key in speeds:
+            return speeds[key]
+    for k in [key, key.rsplit(':', 1)[0], key.split(':', 1)[0]]:
+        if k in DEFAULT_SPEEDS:
+            return DEFAULT_SPEEDS[k]
+    return DEFAULT_SPEEDS['video']
+
+
+def _frame_rate(stream: StreamSummary) -> float:
+    num, _, den = (stream.avg_frame_rate or '').partition('/')
+    try:
+        rate = float(num) / float(den) if den else float(num)
+    except (ValueError, ZeroDivisionError):
+        return REFERENCE_FPS
+    return rate if rate > 0 else REFERENCE_FPS
+
+
+def _part_key(stream_type: str, codec: str, options: list[tuple[str, str]]) -> str:
+    key = f'{stream_type}:{codec}'
+    preset = dict(options).get('preset')
+    return f'{key}:{preset}' if preset else key
+
+
+def estimate(plan: MappingPlan, streams: dict[str, tuple[StreamSummary, ...]], duration: Optional[float],
+             size: int) -> dict[str, float]:
+    '''Estimated seconds per part of the task.'''
+    parts = {'copy': size / get_speed('copy')}
+    if not duration:
+        return parts
+
+    summaries = {(s.codec_type, s.idx): s for summaries in streams.values() for s in summaries}
+    for stream in plan.streams:
+        if stream.action != ENCODE:
+            continue
+        key = _part_key(stream.stream_type, stream.codec, stream.options)
+        seconds = duration / get_speed(key)
+        summary = summaries.get((stream.stream_type, stream.idx))
+        if stream.stream_type == 'video' and summary is not None:
+            if summary.width and summary.height:
+                seconds *= summary.width * summary.height / REFERENCE_PIXELS
+            seconds *= _frame_rate(summary) / REFERENCE_FPS
+        parts[key] = parts.get(key, 0) + seconds
+    return parts
+
+
+def priority_score(seconds: float) -> int:
+    '''
+    Shortest job first: a task loses a point per minute of estimated duration, at most MAX_PRIORITY_PENALTY. The score
+    stays comparable with tasks that are not scored, and tasks with the same score keep the order of the queue.
+    '''
+    return -min(round(seconds / 60), MAX_PRIORITY_PENALTY)
+
+
+def start(library_id: int, path: str, parts: dict[str, float]):
+    '''Remember the estimate of a task that is being processed, to calibrate the model when it is done.'''
+    _started[(library_id, path)] = parts
+
+
+def finish(library_id: int, path: str, seconds: Optional[float]):
+    '''Correct the speed of the largest part of the task with the measured wall time, None if the task failed.'''
+    parts = _started.pop((library_id, path), None)
+    if not parts or seconds is None or seconds <= 0:
+        return
+
+    key = max(parts, key=parts.get)
+    # the other parts are assumed to be correct
+    measured = seconds - (sum(parts.values()) - parts[key])
+    if measured <= 0:
+        return
+
+    speed = get_speed(key)
+    observed = speed * parts[key] / measured
+    with _lock:
+        speeds = _load()
+        speeds[key] = (1 - ALPHA) * speed + ALPHA * observed
+        logger.debug(f'Updated speed of {key}: {speed:.3g} -> {speeds[key]:.3g} (observed {observed:.3g})')
+        try:
+            _save(speeds)
+        except OSError as e:
+            logger.error(f'Could not write {MODEL_PATH}: {e}')
@@ -0,0 +1,81 @@
+from typing import Optional
+
+from .plan import MappingPlan, DROP, ENCODE
+
+# A progressive mp4 has its moov atom in front of the samples. ffmpeg's faststart writes the file and then moves the
+# samples behind the moov, a second pass over the output. With -moov_size it instead reserves space for the moov at the
+# start and writes the file once, but fails the whole task if the moov does not fit. The reservation is therefore an
+# upper bound on the sample tables, the unused space stays in the file as a free atom. Measured tables take 6-9 bytes
+# per sample, the bound is about three times that.
+
+# stsz, stts, ctts and stss entries
+BYTES_PER_SAMPLE = {
+    'video': 24,
+    'audio': 8,
+}
+BYTES_PER_SAMPLE_OTHER = 24
+# stco/co64 and stsc entries
+BYTES_PER_CHUNK = 20
+BYTES_PER_TRACK = 4096
+BYTES_BASE = 64 * 1024
+
+# ffmpeg's mov muxer also ends a chunk at this size
+MAX_CHUNK_BYTES = 2 ** 20
+
+# shortest frames of common audio codecs are 20ms (opus), subtitles get a cue and a gap sample per second
+MIN_AUDIO_FRAME_SAMPLES = 960
+DEFAULT_AUDIO_FRAMES_PER_SECOND = 100
+DEFAULT_VIDEO_FPS = 60
+OTHER_SAMPLES_PER_SECOND = 2
+
+
+def _parse_rate(value) -> float:
+    try:
+        num, _, den = str(value).partition('/')
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _num_samples(stream_info: dict, duration: float, encoded: bool) -> float:
+    codec_type = stream_info.get('codec_type', '')
+    if codec_type == 'video':
+        estimate = duration * (_parse_rate(stream_info.get('avg_frame_rate'))
+                               or _parse_rate(stream_info.get('r_frame_rate')) or DEFAULT_VIDEO_FPS)
+    elif codec_type == 'audio':
+        sample_rate = _parse_rate(stream_info.get('sample_rate'))
+        frames_per_second = sample_rate / MIN_AUDIO_FRAME_SAMPLES if sample_rate else DEFAULT_AUDIO_FRAMES_PER_SECOND
+        estimate = duration * frames_per_second
+    else:
+        estimate = duration * OTHER_SAMPLES_PER_SECOND
+    if not encoded:
+        # exact for copied streams, if the input container knows it
+        try:
+            estimate = max(estimate, int(stream_info.get('nb_frames', 0)))
+        except ValueError:
+            pass
+    return estimate
+
+
+def estimate_size(plan: MappingPlan, ffprobe: dict, duration: Optional[float], chunk_ms: int,
+                  size: int) -> Optional[int]:
+    '''
+    Bytes to reserve for the moov atom of an output with chunks of chunk_ms, written from an input of size bytes.
+    None if it can not be estimated.
+    '''
+    if not duration or duration <= 0 or chunk_ms <= 0:
+        return None
+    streams = {s.get('index'): s for s in ffprobe.get('streams', [])}
+    # chunks end after chunk_ms or MAX_CHUNK_BYTES, the output is assumed to be at most twice the input
+    num_chunks = duration * 1000 / chunk_ms + 2 * size / MAX_CHUNK_BYTES + 1
+    moov_size = BYTES_BASE
+    for stream in plan.streams:
+        if stream.action == DROP:
+            continue
+        stream_info = streams.get(stream.index)
+        if stream_info is None:
+            return None
+        num_samples = _num_samples(stream_info, duration, stream.action == ENCODE)
+        moov_size += (BYTES_PER_TRACK + num_chunks * BYTES_PER_CHUNK
+                      + num_samples * BYTES_PER_SAMPLE.get(stream.stream_type, BYTES_PER_SAMPLE_OTHER))
+    return int(moov_size)
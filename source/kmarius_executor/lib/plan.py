@@ -0,0 +1,171 @@
+from typing import Optional
+
+from .streams import StreamSummary, all_streams
+
+# The handlers describe what should happen to each stream in a plan instead of writing ffmpeg arguments. The executor
+# compiles the plan into the ffmpeg arguments once, with the correct output stream indices.
+
+KEEP = 'keep'
+'''stream is untouched by all handlers'''
+COPY = 'copy'
+'''stream is explicitly copied'''
+DROP = 'drop'
+ENCODE = 'encode'
+
+_CHARS = {
+    'video': 'v',
+    'audio': 'a',
+    'subtitle': 's',
+    'data': 'd',
+    'attachment': 't',
+}
+
+METADATA_KEYS = ['title', 'name', 'comment', 'handler_name', 'vendor_id']
+
+
+class StreamPlan:
+    __slots__ = ('stream_type', 'idx', 'index', 'action', 'codec', 'options', 'strip_metadata')
+
+    def __init__(self, stream_type: str, idx: int, index: int, action: str = KEEP, codec: Optional[str] = None,
+                 options: Optional[list[tuple[str, str]]] = None, strip_metadata=False):
+        self.stream_type = stream_type
+        self.idx = idx
+        '''index among the input streams of the same type'''
+        self.index = index
+        '''index in the input file'''
+        self.action = action
+        self.codec = codec
+        self.options = options or []
+        '''per-stream options, e.g. [('b', '128k')], the stream specifier is added when compiling'''
+        self.strip_metadata = strip_metadata
+
+    def is_noop(self) -> bool:
+        return self.action in [KEEP, COPY] and not self.strip_metadata
+
+    def to_list(self) -> list:
+        return [self.stream_type, self.idx, self.index, self.action, self.codec, self.options, self.strip_metadata]
+
+    @staticmethod
+    def from_list(values: list) -> 'StreamPlan':
+        stream_type, idx, index, action, codec, options, strip_metadata = values
+        return StreamPlan(stream_type, idx, index, action, codec, [tuple(option) for option in options],
+                          strip_metadata)
+
+    def __repr__(self):
+        return f'StreamPlan({self.stream_type}:{self.idx} {self.action})'
+
+
+class MappingPlan:
+    def __init__(self, streams: list[StreamPlan], strip_global_metadata=False,
+                 sidecars: Optional[list[tuple[str, int, str]]] = None):
+        self.streams = streams
+        '''in the order of the input file'''
+        self.strip_global_metadata = strip_global_metadata
+        self.sidecars = sidecars or []
+        '''streams written to additional outputs next to the original file: (stream_type, idx, suffix)'''
+        self._by_type_idx = {(s.stream_type, s.idx): s for s in streams}
+
+    @staticmethod
+    def from_summaries(summaries: dict[str, tuple[StreamSummary, ...]]) -> 'MappingPlan':
+        return MappingPlan([StreamPlan(s.codec_type, s.idx, s.index) for s in all_streams(summaries)])
+
+    def get(self, stream_type: str, idx: int) -> StreamPlan:
+        return self._by_type_idx[(stream_type, idx)]
+
+    def keep(self, stream_type: str, idx: int):
+        stream = self.get(stream_type, idx)
+        stream.action = KEEP
+        stream.codec = None
+        stream.options = []
+
+    def copy(self, stream_type: str, idx: int):
+        stream = self.get(stream_type, idx)
+        stream.action = COPY
+        stream.codec = None
+        stream.options = []
+
+    def drop(self, stream_type: str, idx: int):
+        self.get(stream_type, idx).action = DROP
+
+    def encode(self, stream_type: str, idx: int, codec: str, **options: str):
+        stream = self.get(stream_type, idx)
+        stream.action = ENCODE
+        stream.codec = codec
+        stream.options = list(options.items())
+
+    def strip_metadata(self, stream_type: str, idx: int):
+        self.get(stream_type, idx).strip_metadata = True
+
+    def extract(self, stream_type: str, idx: int, suffix: str) -> bool:
+        '''Write the stream to {stem of the original file}{suffix} in the same ffmpeg pass.'''
+        if any(sidecar[2] == suffix for sidecar in self.sidecars):
+            return False
+        self.sidecars.append((stream_type, idx, suffix))
+        return True
+
+    def is_noop(self) -> bool:
+        '''True if compiling the plan would only result in a remux of the file.'''
+        return not self.strip_global_metadata and not self.sidecars and all(s.is_noop() for s in self.streams)
+
+    def encodes(self, stream_type: str = None) -> bool:
+        return any(s.action == ENCODE for s in self.streams if stream_type is None or s.stream_type == stream_type)
+
+    def only_drops(self) -> bool:
+        '''True if the plan does nothing but remove streams, i.e. it can be applied by tools other than ffmpeg.'''
+        return (not self.strip_global_metadata and not self.sidecars
+                and all(s.action in [KEEP, COPY, DROP] and not s.strip_metadata for s in self.streams))
+
+    def compile(self) -> list[str]:
+        '''Stream mapping and encoding arguments for ffmpeg.'''
+        outputs = [s for s in self.streams if s.action != DROP]
+
+        # a single set of args clears metadata of all output streams
+        strip_all = bool(outputs) and all(s.strip_metadata for s in outputs)
+
+        # remux only, nothing is decoded
+        copy_all = not self.encodes()
+
+        mapping = []
+        encoding = ['-c', 'copy'] if copy_all else []
+        counts = {c: 0 for c in _CHARS.values()}
+        for stream in outputs:
+            c = _CHARS[stream.stream_type]
+            out = counts[c]
+            counts[c] += 1
+
+            mapping += ['-map', f'0:{c}:{stream.idx}']
+            if stream.action == ENCODE:
+                encoding += [f'-c:{c}:{out}', stream.codec]
+                for key, value in stream.options:
+                    encoding += [f'-{key}:{c}:{out}', str(value)]
+            elif not copy_all:
+                encoding += [f'-c:{c}:{out}', 'copy']
+
+            if stream.strip_metadata and not strip_all:
+                for key in METADATA_KEYS:
+                    encoding += [f'-metadata:s:{c}:{out}', f'{key}=']
+
+        if strip_all:
+            for key in METADATA_KEYS:
+                encoding += ['-metadata:s', f'{key}=']
+
+        return mapping + encoding
+
+    def compile_sidecars(self, stem: str) -> list[str]:
+        '''Additional ffmpeg outputs, to be placed after the main output file.'''
+        args = []
+        for stream_type, idx, suffix in self.sidecars:
+            args += ['-map', f'0:{_CHARS[stream_type]}:{idx}', '-y', f'{stem}{suffix}']
+        return args
+
+    def to_dict(self) -> dict:
+        return {
+            'streams': [s.to_list() for s in self.streams],
+            'strip_global_metadata': self.strip_global_metadata,
+            'sidecars': self.sidecars,
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'MappingPlan':
+        return MappingPlan([StreamPlan.from_list(s) for s in data['streams']], data['strip_global_metadata'],
+                           [tuple(sidecar) for sidecar in data.get('sidecars', [])])
@@ -0,0 +1,80 @@
+import os
+from typing import NamedTuple, Optional
+
+# Handlers only look at a handful of stream properties. Instead of carrying the complete ffprobe output (and per-type
+# views mutating the same dicts) in the task data of every pending task, the task data holds one of these immutable
+# summaries per stream, plus a reference to the probe which is looked up from the probe cache when it is needed.
+
+STREAM_TYPES = ['video', 'audio', 'subtitle', 'data', 'attachment']
+
+
+class StreamSummary(NamedTuple):
+    index: int
+    '''stream index in the file'''
+    idx: int
+    '''index among the streams of the same type'''
+    codec_type: str
+    codec_name: str
+    channels: Optional[int] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    pix_fmt: Optional[str] = None
+    bit_rate: Optional[int] = None
+    '''from bit_rate or the BPS tag set by mkvmerge'''
+    language: str = ''
+    title: str = ''
+    avg_frame_rate: Optional[str] = None
+
+
+def _get_bit_rate(stream_info: dict) -> Optional[int]:
+    try:
+        if 'bit_rate' in stream_info:
+            return int(stream_info['bit_rate'])
+        for key, val in stream_info.get('tags', {}).items():
+            if key.startswith('BPS'):
+                return int(val)
+    except ValueError:
+        pass
+    return None
+
+
+def summarize(stream_info: dict, idx: int) -> StreamSummary:
+    tags = stream_info.get('tags', {})
+    channels = stream_info.get('channels')
+    return StreamSummary(
+        index=stream_info.get('index'),
+        idx=idx,
+        codec_type=stream_info.get('codec_type', '').lower(),
+        codec_name=stream_info.get('codec_name', ''),
+        channels=int(channels) if channels is not None else None,
+        width=stream_info.get('width'),
+        height=stream_info.get('height'),
+        pix_fmt=stream_info.get('pix_fmt'),
+        bit_rate=_get_bit_rate(stream_info),
+        language=tags.get('language', '').lower(),
+        title=tags.get('title', ''),
+        avg_frame_rate=stream_info.get('avg_frame_rate'),
+    )
+
+
+def summarize_probe(probe_info: dict) -> dict[str, tuple[StreamSummary, ...]]:
+    streams = {stream_type: [] for stream_type in STREAM_TYPES}
+    for stream_info in probe_info.get('streams', []):
+        codec_type = stream_info.get('codec_type', '').lower()
+        if codec_type in streams:
+            streams[codec_type].append(summarize(stream_info, len(streams[codec_type])))
+    return {stream_type: tuple(summaries) for stream_type, summaries in streams.items()}
+
+
+def all_streams(streams: dict[str, tuple[StreamSummary, ...]]) -> list[StreamSummary]:
+    '''All streams in the order of the file.'''
+    return sorted((s for summaries in streams.values() for s in summaries), key=lambda s: s.index)
+
+
+def probe_ref(path: str) -> dict:
+    st = os.stat(path)
+    return {
+        'path': path,
+        'mtime': int(st.st_mtime),
+        'size': st.st_size,
+    }
@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from unmanic.libs import common
+
+from kmarius_library.lib import startup
+
+from . import logger, PLUGIN_ID
+from .plan import MappingPlan
+from .streams import StreamSummary
+
+# this is how we pass task data from tester to processor. the data is stored on disk so that pending tasks keep their
+# mappings across restarts and plugin updates.
+
+DB_PATH = os.path.join(common.get_home_dir(), '.unmanic', 'userdata', PLUGIN_ID, 'task_data.db')
+
+# oldest entries are evicted beyond this, these are tasks that were removed from the queue or never processed
+MAX_ENTRIES = 20000
+EVICT_INTERVAL = 100
+
+_local = threading.local()
+_num_puts = 0
+
+
+# NOTE: only reuse in short-lived threads like FileTester
+def _get_connection(reuse_connection=False) -> sqlite3.Connection:
+    _ensure_init()
+    if reuse_connection:
+        if not hasattr(_local, 'connection'):
+            _local.connection = sqlite3.connect(DB_PATH)
+        return _local.connection
+    else:
+        return sqlite3.connect(DB_PATH)
+
+
+def _init():
+    if not os.path.exists(os.path.dirname(DB_PATH)):
+        os.makedirs(os.path.dirname(DB_PATH))
+
+    with sqlite3.connect(DB_PATH) as conn:
+        cur = conn.cursor()
+        cur.execute('''
+                    CREATE TABLE IF NOT EXISTS task_data
+                    (
+                        library_id INTEGER NOT NULL,
+                        path       TEXT    NOT NULL,
+                        mtime      INTEGER NOT NULL,
+                        created    INTEGER NOT NULL,
+                        data       TEXT    NOT NULL,
+                        PRIMARY KEY (library_id, path)
+                    )''')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_created ON task_data (created)')
+
+    startup.run_in_background(f'{PLUGIN_ID}-task-data-eviction', _evict_all)
+
+
+def _evict(cur: sqlite3.Cursor):
+    [[count]] = cur.execute('SELECT COUNT(*) FROM task_data')
+    if count > MAX_ENTRIES:
+        logger.info(f'Evicting {count - MAX_ENTRIES} old task data entries')
+        cur.execute('''
+                    DELETE FROM task_data
+                    WHERE rowid IN (SELECT rowid FROM task_data ORDER BY created LIMIT ?)
+                    ''', (count - MAX_ENTRIES,))
+
+
+def _evict_all():
+    with sqlite3.connect(DB_PATH) as conn:
+        _evict(conn.cursor())
+
+
+_ensure_init = startup.LazyInit('task data', _init)
+
+
+def _compact(task_data: dict) -> str:
+    # stream summaries are stored as plain arrays
+    return json.dumps({**task_data, 'plan': task_data['plan'].to_dict()}, separators=(',', ':'))
+
+
+def _expand(data: str) -> dict:
+    task_data = json.loads(data)
+    task_data['streams'] = {stream_type: tuple(StreamSummary(*s) for s in summaries)
+                            for stream_type, summaries in task_data['streams'].items()}
+    task_data['plan'] = MappingPlan.from_dict(task_data['plan'])
+    return task_data
+
+
+def put(library_id: int, path: str, task_data: dict, reuse_connection=False):
+    global _num_puts
+    mtime = int(os.path.getmtime(path))
+    now = int(time.time())
+    with _get_connection(reuse_connection) as conn:
+        cur = conn.cursor()
+        cur.execute('''
+                    INSERT INTO task_data (library_id, path, mtime, created, data)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(library_id, path)
+                        DO UPDATE SET (mtime, created, data) = (EXCLUDED.mtime, EXCLUDED.created, EXCLUDED.data)
+                    ''', (library_id, path, mtime, now, _compact(task_data)))
+        _num_puts += 1
+        if _num_puts % EVICT_INTERVAL == 0:
+            _evict(cur)
+
+
+def clear(library_id: int, path: str, reuse_connection=False):
+    with _get_connection(reuse_connection) as conn:
+        conn.execute('DELETE FROM task_data WHERE library_id = ? AND path = ?', (library_id, path))
+
+
+def get(library_id: int, path: str, delete=False) -> Optional[dict]:
+    with _get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('SELECT mtime, data FROM task_data WHERE library_id = ? AND path = ?', (library_id, path))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        if delete:
+            cur.execute('DELETE FROM task_data WHERE library_id = ? AND path = ?', (library_id, path))
+
+    mtime, data = row
+    try:
+        if int(os.path.getmtime(path)) != mtime:
+            logger.info(f'File changed since it was tested, discarding task data: path={path}')
+            return None
+    except OSError:
+        return None
+    try:
+        return _expand(data)
+    except (KeyError, TypeError) as e:
+        logger.error(f'Discarding task data in outdated format: path={path} error={e}')
+        return None
@@ -1,61 +1,69 @@
 import os
 import subprocess
+from typing import Optional
 
 from unmanic.libs.unplugins.settings import PluginSettings
 
-from kmarius_executor.lib import logger, init_task_data, clear_task_data, get_task_data, put_task_data
-from kmarius_executor.lib.ffmpeg import StreamMapper, Parser
+from kmarius_executor.lib import logger, init_task_data, task_store, cost, moov
+from kmarius_library.lib.ffmpeg import Parser
+from kmarius_executor.lib.plan import MappingPlan, DROP
 from kmarius_executor.lib.types import *
+from kmarius_library.lib import probes, settings_cache
+from kmarius_library.lib.mp4box import MP4Box
 
 
 class Settings(PluginSettings):
     settings = {
         'apply_faststart': True,
+        'interleave_output': True,
+        'remux_with_mp4box': True,
+        'interleave_parameter': 500,
+        'prioritize_short_tasks': True,
     }
     form_settings = {
         'apply_faststart': {
             'label': 'Apply faststart for MP4 files',
             'description': 'Disable this e.g. if the plugin is followed by the interleave plugin which does the same.',
-        }
+        },
+        'interleave_output': {
+            'label': 'Write MP4 output progressive and interleaved in a single pass',
+            'description': 'Instead of faststart, space for the moov atom is reserved at the front and the streams are '
+                           'interleaved in chunks of the interleave parameter, the interleave plugin then has nothing '
+                           'left to do.',
+        },
+        'remux_with_mp4box': {
+            'label': 'Use MP4Box for MP4 files that only need streams removed',
+            'description': 'Removes the tracks, moves the moov atom to the front and interleaves in a single write.',
+        },
+        'interleave_parameter': {
+            'label': 'Interleave parameter in ms',
+            'description': 'Should match the setting of the interleave plugin.',
+        },
+        'prioritize_short_tasks': {
+            'label': 'Prioritize short tasks',
+            'description': 'Queue tasks by their estimated processing time, so that remuxes are not stuck behind long '
+                           'encodes. Tasks lose at most 60 points of priority, tasks of similar length keep their order.',
+        },
     }
 
     def __init__(self, *args, **kwargs):
         super(Settings, self).__init__(*args, **kwargs)
 
 
-class PluginStreamMapper(StreamMapper):
-    def __init__(self, mappings: dict):
-        super(PluginStreamMapper, self).__init__(
-            logger, ['audio', 'video', 'subtitle', 'data', 'attachment'])
-        self.mappings = mappings
-        self.settings = None
-
-    def set_default_values(self, settings, abspath, probe):
-        self.abspath = abspath
-        self.set_probe(probe)
-        self.set_input_file(abspath)
-        self.settings = settings
-
-    def test_stream_needs_processing(self, stream_info: dict):
-        stream_type = stream_info.get('codec_type', '').lower()
-        if not stream_type in self.mappings:
-            # no mappings for this type of stream
-            return False
-        return stream_info['idx'] in self.mappings[stream_type]
-
-    def custom_stream_mapping(self, stream_info: dict, stream_id: int):
-        stream_type = stream_info.get('codec_type', '').lower()
-        return self.mappings[stream_type][stream_id]
+def _is_matroska(path: str) -> bool:
+    ext = os.path.splitext(path)[1][1:].lower()
+    return ext in ['mkv', 'webm']
 
 
 # this catches some malformed hevc (?) in mkv that can result in ffmpeg
 # creating broken files that can not be repaired
-# TODO: lets see if this test works with different codecs/containers of if we should restrict it to mkv
-def _mkv_remux_looks_ok(path: str, mappings: dict) -> bool:
-    for i, mapping in mappings.items():
-        if mapping['stream_encoding']:
-            # this means we are not just remuxing, which will work fine
-            return True
+def _mkv_remux_looks_ok(path: str, plan: MappingPlan) -> bool:
+    if plan.encodes('video'):
+        # this means we are not just remuxing, which will work fine
+        return True
+
+    if not _is_matroska(path):
+        return True
 
     command = [
         'ffmpeg', '-y', '-t', '1', '-i', path, '-c', 'copy', '-map', '0', '-sn', '-dn', '-f', 'matroska', '/dev/null'
@@ -64,66 +72,134 @@ def _mkv_remux_looks_ok(path: str, mappings: dict) -> bool:
     return proc.returncode == 0
 
 
+def _build_mp4box_remux_command(file_in: str, file_out: str, plan: MappingPlan, mp4box: dict,
+                                param: int) -> Optional[list[str]]:
+    # the ffmpeg command strips global metadata (-map_metadata -1), MP4Box keeps it. only take this path if there is
+    # nothing to strip, so that the output does not depend on the path a file takes
+    if mp4box.get('tags'):
+        logger.debug(f'Not remuxing with MP4Box, global metadata needs to be stripped: path={file_in}')
+        return None
+    # tracks of an mp4 are listed in the same order by ffprobe and MP4Box
+    tracks = mp4box.get('tracks', [])
+    if len(tracks) != len(plan.streams):
+        logger.warning(f'Number of MP4Box tracks does not match the number of streams: path={file_in}')
+        return None
+    remove_track_ids = [track['id'] for track, stream in zip(tracks, plan.streams) if stream.action == DROP]
+    return MP4Box.build_remux_command(file_in, file_out, param, remove_track_ids)
+
+
 def on_library_management_file_test(data: FileTestData, **kwargs):
     task_data = init_task_data(data)
     library_id = data.get('library_id')
     path = data.get('path')
 
+    plan: MappingPlan = task_data['plan']
+    if task_data['add_file_to_pending_tasks'] and plan.is_noop() and not task_data.get('needs_remux', False):
+        # handlers requested processing, but the resulting command would not change any stream
+        logger.info(f'Not queueing file, the mapping plan only copies streams: path={path}')
+        task_data['add_file_to_pending_tasks'] = False
+
     if task_data['add_file_to_pending_tasks']:
         data['add_file_to_pending_tasks'] = True
-        put_task_data(library_id, path, task_data)
+        parts = cost.estimate(plan, task_data['streams'], task_data['duration'], task_data['probe_ref']['size'])
+        task_data['cost'] = parts
+        if settings_cache.get(Settings, library_id).get_setting('prioritize_short_tasks'):
+            data['priority_score'] = data.get('priority_score', 0) + cost.priority_score(sum(parts.values()))
+        task_store.put(library_id, path, task_data, reuse_connection=True)
     else:
         # there might be leftover data, e.g. if a task is removed from the processing queue
-        clear_task_data(library_id, path)
+        task_store.clear(library_id, path, reuse_connection=True)
 
 
 def on_worker_process(data: ProcessItemData, **kwargs):
     library_id = data['library_id']
     path = data['original_file_path']
 
-    settings = Settings(library_id=library_id)
+    settings = settings_cache.get(Settings, library_id)
     apply_faststart = settings.get_setting('apply_faststart')
 
-    task_data = get_task_data(library_id, path, delete=True)
+    file_in = data.get('file_in')
+
+    task_data = task_store.get(library_id, path, delete=True)
     if task_data is None:
         # an unrelated plugin requested processing
         data['exec_command'] = []
         return
 
-    file_in = data.get('file_in')
-    ffprobe = task_data.get('ffprobe')
-
-    mapper = PluginStreamMapper(task_data['mappings'])
-    mapper.set_default_values(None, file_in, ffprobe)
+    plan: MappingPlan = task_data['plan']
 
     needs_remux = task_data.get('needs_remux', False)
     needs_faststart = task_data.get('moov_to_front', False)
 
-    if mapper.streams_need_processing() or needs_remux or (needs_faststart and apply_faststart):
+    if not plan.is_noop() or needs_remux or (needs_faststart and apply_faststart):
         file_out = data.get('file_out')
+        if 'cost' in task_data:
+            cost.start(library_id, path, task_data['cost'])
 
         if needs_remux:
-            if not _mkv_remux_looks_ok(file_in, task_data['mappings'].get('video', {})):
+            if not _mkv_remux_looks_ok(file_in, plan):
                 data['exec_command'] = ['false', 'File is possibly broken, will not remux:', file_in]
                 return
             stem, _ = os.path.splitext(file_out)
             file_out = f'{stem}.mp4'
             data['file_out'] = file_out
 
-        mapper.set_input_file(file_in)
-        mapper.set_output_file(file_out)
+        # remux engine: tracks are only removed from an mp4, MP4Box does that without touching the samples and
+        # writes a progressive, interleaved file
+        ext_in = os.path.splitext(file_in)[1][1:].lower()
+        param = settings.get_int('interleave_parameter')
+        if ext_in == 'mp4' and plan.only_drops() and settings.get_setting('remux_with_mp4box'):
+            mp4box = probes.get('mp4box', file_in, persist=file_in == path)
+            if mp4box is not None:
+                command = _build_mp4box_remux_command(file_in, file_out, plan, mp4box, param)
+                if command is not None:
+                    data['exec_command'] = command
+                    data['command_progress_parser'] = MP4Box.parse_progress
+                    return
+
+        # the full probe is needed for progress reporting and the size of the moov, it comes from the probe cache of
+        # the tested file
+        ffprobe = probes.get('ffprobe', task_data['probe_ref']['path'])
+
+        # finalization: faststart is a second pass over the output, the interleave plugin would then rewrite it again.
+        # instead, the moov gets reserved space in front and ffmpeg interleaves the chunks, the output is written once
+        ext_out = os.path.splitext(file_out)[1][1:].lower()
+        moov_size = None
+        if ext_out == 'mp4' and settings.get_setting('interleave_output') and ffprobe is not None:
+            moov_size = moov.estimate_size(plan, ffprobe, task_data['duration'], param,
+                                           task_data['probe_ref']['size'])
+            if moov_size is None:
+                logger.info(f'Could not estimate the moov size, using faststart: path={path}')
 
         #  '-map', '-0:t', used in old script but fails here
-        mapper.main_options += ['-map_metadata', '-1']
+        command = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'info',
+            '-i', file_in,
+            '-map_metadata', '-1',
+        ]
+
+        if moov_size is not None:
+            command += ['-chunk_duration', str(param * 1000), '-moov_size', str(moov_size)]
+        elif apply_faststart:
+            command += ['-movflags', '+faststart']
+
+        command += ['-strict', '-2', '-max_muxing_queue_size', '4096']
+        command += plan.compile()
+        command += ['-y', file_out]
+
+        # side-car outputs, e.g. extracted subtitles, so the file is only read once
+        original_stem, _ = os.path.splitext(path)
+        command += plan.compile_sidecars(original_stem)
 
-        if apply_faststart:
-            mapper.main_options += ['-movflags', '+faststart']
+        data['exec_command'] = command
 
-        ffmpeg_args = mapper.get_ffmpeg_args()
+        if ffprobe is not None:
+            parser = Parser(logger)
+            parser.set_probe(ffprobe)
+            data['command_progress_parser'] = parser.parse_progress
 
-        data['exec_command'] = ['ffmpeg']
-        data['exec_command'] += ffmpeg_args
 
-        parser = Parser(logger)
-        parser.set_probe(ffprobe)
-        data['command_progress_parser'] = parser.parse_progress
\ No newline at end of file
+def emit_postprocessor_complete(data: PostprocessorCompleteData, **kwargs):
+    # calibrate the cost model with the duration of the task, failed tasks are only forgotten
+    seconds = data['finish_time'] - data['start_time'] if data['task_success'] else None
+    cost.finish(data['library_id'], data['source_data']['abspath'], seconds)
@@ -2,9 +2,10 @@ import os
 
 from unmanic.libs.unplugins.settings import PluginSettings
 
-from kmarius_flac_downsampler.lib.ffmpeg import Probe
+from kmarius_library.lib.ffmpeg import Probe
 from kmarius_flac_downsampler.lib import logger, PLUGIN_ID
 from kmarius_flac_downsampler.lib.types import FileTestData, ProcessItemData
+from kmarius_library.lib import probes, settings_cache
 
 
 class Settings(PluginSettings):
@@ -30,7 +31,7 @@ class Settings(PluginSettings):
 
 
 def on_library_management_file_test(data: FileTestData, **kwargs):
-    settings = Settings(library_id=data.get('library_id'))
+    settings = settings_cache.get(Settings, data.get('library_id'))
     thresh = settings.get_setting('sample_rate_threshold')
 
     path = data.get('path')
@@ -39,11 +40,13 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
         return
 
     probe = Probe(logger, allowed_mimetypes=['audio'])
-    if 'ffprobe' in data['shared_info']:
-        probe.set_probe(data['shared_info']['ffprobe'])
-    else:
-        if not probe.file(path):
+    if 'ffprobe' not in data['shared_info']:
+        probe_info = probes.get('ffprobe', path, reuse_connection=True)
+        if probe_info is None:
             return
+        data['shared_info']['ffprobe'] = probe_info
+    if not probe.set_probe(data['shared_info']['ffprobe']):
+        return
 
     for stream_info in probe.get('streams', {}):
         if 'sample_rate' in stream_info:
@@ -56,7 +59,7 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
 
 
 def on_worker_process(data: ProcessItemData, **kwargs):
-    settings = Settings(library_id=data.get('library_id'))
+    settings = settings_cache.get(Settings, data.get('library_id'))
     thresh = settings.get_setting('sample_rate_threshold')
     sample_rate = settings.get_setting('target_sample_rate')
     sample_fmt = settings.get_setting('target_sample_fmt')
@@ -69,7 +72,8 @@ def on_worker_process(data: ProcessItemData, **kwargs):
         return
 
     probe = Probe(logger, allowed_mimetypes=['audio'])
-    if not probe.file(file_in):
+    probe_info = probes.get('ffprobe', file_in, persist=file_in == data.get('original_file_path'))
+    if probe_info is None or not probe.set_probe(probe_info):
         return
 
     for stream_info in probe.get('streams', {}):
@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import threading
+import time
+
+from kmarius_library.lib import startup
+
+from . import logger, PLUGIN_ID
+from . import issues
+
+# After a scan, everything stored about files that are no longer in the library is removed. The timestamps database of
+# the library plugin is attached and orphans are deleted with an anti-join, in batches of rowids that are committed
+# separately, so the write lock is only held briefly. A run stops after MAX_SECONDS, the next one continues where it
+# stopped.
+
+THREAD_NAME = f'{PLUGIN_ID.replace('_', '-')}-cleanup'
+
+BATCH_SIZE = 5000
+MAX_SECONDS = 60
+
+_IN_LIBRARY = 'EXISTS (SELECT 1 FROM ts.timestamps t WHERE t.library_id = x.library_id AND t.path = x.path)'
+
+# table, whether it has a library_id column
+TABLES = [
+    ('issues', True),
+    ('jobs', True),
+    ('rule_results', False),
+    ('decode_errors', False),
+]
+
+_lock = threading.Lock()
+_positions: dict[tuple[str, int], int] = {}
+'''last rowid checked of an unfinished run, per table and library'''
+
+
+def _orphan_clause(has_library_id: bool, library_ids: list[int]) -> str:
+    if has_library_id:
+        return f'x.library_id = ? AND NOT {_IN_LIBRARY}'
+    # results are not stored per library, the paths of all libraries are kept. the IN list lets the lookup use the
+    # primary key (library_id, path) of the timestamps table
+    placeholders = ', '.join('?' * len(library_ids))
+    return f'''NOT EXISTS (SELECT 1
+                           FROM ts.timestamps t
+                           WHERE t.library_id IN ({placeholders})
+                             AND t.path = x.path)'''
+
+
+def _clean_table(conn: sqlite3.Connection, table: str, has_library_id: bool, library_id: int,
+                 library_ids: list[int], deadline: float) -> tuple[int, int, bool]:
+    '''Returns the rows scanned and deleted, and whether the whole table was checked.'''
+    key = (table, library_id if has_library_id else None)
+    last = _positions.get(key, 0)
+    parameters = (library_id,) if has_library_id else tuple(library_ids)
+    scope, scope_parameters = ('library_id = ? AND ', (library_id,)) if has_library_id else ('', ())
+    orphan = _orphan_clause(has_library_id, library_ids)
+    scanned, deleted = 0, 0
+    while time.monotonic() < deadline:
+        [[upper, count]] = conn.execute(f'''
+                                        SELECT MAX(rowid), COUNT(*)
+                                        FROM (SELECT rowid
+                                              FROM {table}
+                                              WHERE {scope}rowid > ?
+                                              ORDER BY rowid
+                                              LIMIT ?)''', scope_parameters + (last, BATCH_SIZE))
+        if not count:
+            _positions.pop(key, None)
+            return scanned, deleted, True
+        with conn:
+            deleted += conn.execute(f'''
+                                    DELETE
+                                    FROM {table}
+                                    WHERE rowid IN (SELECT x.rowid
+                                                    FROM {table} x
+                                                    WHERE x.rowid > ?
+                                                      AND x.rowid <= ?
+                                                      AND {orphan})''', (last, upper) + parameters).rowcount
+        scanned += count
+        last = upper
+        _positions[key] = last
+    return scanned, deleted, False
+
+
+def remove_orphans(library_id: int, timestamps_db: str) -> dict[str, tuple[int, int]]:
+    '''Delete everything stored about files not in the timestamps database, returns rows (scanned, deleted) per table.'''
+    if not os.path.exists(timestamps_db):
+        # an empty database would remove everything
+        logger.info(f'No timestamps database, skipping the cleanup of library {library_id}')
+        return {}
+
+    deadline = time.monotonic() + MAX_SECONDS
+    report = {}
+    conn = sqlite3.connect(issues.DB_PATH, timeout=startup.BUSY_TIMEOUT)
+    try:
+        conn.execute('ATTACH DATABASE ? AS ts', (timestamps_db,))
+        library_ids = [row[0] for row in conn.execute('SELECT DISTINCT library_id FROM ts.timestamps')]
+        if library_id not in library_ids:
+            logger.info(f'No files of library {library_id} in the timestamps database, skipping the cleanup')
+            return {}
+        for table, has_library_id in TABLES:
+            scanned, deleted, done = _clean_table(conn, table, has_library_id, library_id, library_ids, deadline)
+            report[table] = (scanned, deleted)
+            if not done:
+                logger.info(f'Cleanup of library {library_id} stopped after {MAX_SECONDS}s in table {table}, '
+                            f'continuing after the next scan')
+                break
+    finally:
+        conn.close()
+    issues._invalidate()
+    logger.info(f'Cleanup of library {library_id}: '
+                f'{', '.join(f'{table} {deleted}/{scanned}' for table, (scanned, deleted) in report.items())} '
+                f'rows deleted/scanned')
+    return report
+
+
+def start(library_id: int, timestamps_db: str) -> bool:
+    '''Run remove_orphans in a background thread, returns False if a cleanup is still running.'''
+    if not _lock.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            remove_orphans(library_id, timestamps_db)
+        except Exception as e:
+            logger.error(f'Cleanup of library {library_id} failed: {e}')
+        finally:
+            _lock.release()
+
+    threading.Thread(target=run, name=THREAD_NAME, daemon=True).start()
+    return True
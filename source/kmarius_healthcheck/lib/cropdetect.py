@@ -0,0 +1,118 @@
+import os
+import re
+import subprocess
+from collections import Counter
+from typing import Optional
+
+from kmarius_library.lib import cache, io_governor
+
+from . import logger
+
+# Black bar detection on a sample of the file instead of decoding 30 second windows. ffmpeg seeks to a number of
+# points spread over the file and decodes a few keyframes at each, every frame votes for its crop. Sampling stops early
+# once the votes agree. Results are stored in the metadata cache of the library plugin.
+
+TABLE = 'cropdetect'
+cache.register_table(TABLE)
+VERSION = 2
+'''cached results of other versions are detected again, version 1 never saw a frame'''
+
+NUM_SAMPLES = 8
+'''seek points, evenly spread over the file without the first and last 5 percent (intros, credits)'''
+MIN_SAMPLES = 3
+'''seek points that have to agree before stopping early'''
+FRAMES_PER_SAMPLE = 2
+# cropdetect ignores the first frames it is given (option skip, 2 by default). skip=0 needs a recent ffmpeg, instead
+# these are decoded in addition
+CROPDETECT_SKIP = 2
+MARGIN = 0.05
+
+# detected dimensions often slightly differ from the real ones, but I've never seen it higher than 16 pixels
+THRESH = 16
+
+# rarely the output looks like crop=-XX:-YY:..., these are black frames and don't vote
+_CROP = re.compile(r'crop=(-?\d+):(-?\d+):\d+:\d+')
+
+
+def _sample(path: str, ss: float, keyframes_only=True) -> list[tuple[int, int]]:
+    command = ['ffmpeg', '-hide_banner', '-nostats']
+    if keyframes_only:
+        command += ['-skip_frame', 'nokey']
+    command += [
+        '-ss', f'{ss:.3f}', '-i', path,
+        '-map', '0:v:0', '-frames:v', str(CROPDETECT_SKIP + FRAMES_PER_SAMPLE),
+        '-vf', 'cropdetect=reset=1', '-f', 'null', '-',
+    ]
+    proc = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    votes = []
+    for width, height in _CROP.findall(proc.stderr.decode('utf-8', errors='replace')):
+        width, height = int(width), int(height)
+        if width > 0 and height > 0:
+            votes.append((width, height))
+    return votes
+
+
+def _seek_points(duration: float) -> list[float]:
+    if duration <= 0:
+        return [0.0]
+    start = duration * MARGIN
+    span = duration * (1 - 2 * MARGIN)
+    points = [start + span * (i + 0.5) / NUM_SAMPLES for i in range(NUM_SAMPLES)]
+    # bit-reversed order (0, 4, 2, 6, 1, ...), so that an early stop still covers the whole file
+    bits = (NUM_SAMPLES - 1).bit_length()
+    order = sorted(range(NUM_SAMPLES), key=lambda i: int(f'{i:0{bits}b}'[::-1], 2))
+    return [points[i] for i in order]
+
+
+def _has_bars(width: int, height: int, crop: tuple[int, int]) -> bool:
+    return width - crop[0] > THRESH or height - crop[1] > THRESH
+
+
+def detect(path: str, width: int, height: int, duration: float) -> Optional[tuple[int, int]]:
+    '''Most common crop of the sampled frames, or None if all sampled frames were black.'''
+    votes = Counter()
+    decisions = []
+    with io_governor.reading(path):
+        for ss in _seek_points(duration):
+            sample = _sample(path, ss)
+            if not sample:
+                continue
+            votes.update(sample)
+            crop, _ = Counter(sample).most_common(1)[0]
+            decisions.append(_has_bars(width, height, crop))
+            if len(decisions) >= MIN_SAMPLES and len(set(decisions)) == 1:
+                break
+        if not votes:
+            # short files with long GOPs can have fewer keyframes than are skipped, decode regular frames instead
+            votes.update(_sample(path, duration / 2, keyframes_only=False))
+    if not votes:
+        return None
+    crop, _ = votes.most_common(1)[0]
+    return crop
+
+
+def has_black_bars(path: str, probe: dict) -> bool:
+    video = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
+    if video is None or 'width' not in video or 'height' not in video:
+        return False
+    width, height = video['width'], video['height']
+    try:
+        duration = float(probe['format']['duration'])
+    except (KeyError, ValueError):
+        duration = 0.0
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    mtime = int(st.st_mtime)
+
+    cached = cache.get(TABLE, path, mtime, size=st.st_size)
+    if cached is None or cached.get('version') != VERSION:
+        crop = detect(path, width, height, duration)
+        logger.debug(f'Detected crop {crop} for {width}x{height} - {path}')
+        cached = {'crop': crop, 'version': VERSION}
+        cache.put(TABLE, path, mtime, cached, size=st.st_size)
+
+    crop = cached['crop']
+    return crop is not None and _has_bars(width, height, tuple(crop))
@@ -2,10 +2,13 @@ import os
 import sqlite3
 import threading
 import time
-from typing import List, Tuple
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 
 from unmanic.libs import common
 
+from kmarius_library.lib import startup
+
 from . import logger, PLUGIN_ID
 
 DB_PATH = os.path.join(common.get_home_dir(), '.unmanic', 'userdata', PLUGIN_ID, 'issues.db')
@@ -19,6 +22,7 @@ def SQL(sql):
             with _get_connection(kwargs.get('reuse_connection')) as conn:
                 cur = conn.cursor()
                 cur.execute(sql, tuple(args))
+            _invalidate()
 
         return wrapper
 
@@ -43,10 +47,10 @@ class ExplainCursor(sqlite3.Cursor):
 def _get_connection(reuse_connection=False) -> sqlite3.Connection:
     if reuse_connection:
         if not hasattr(_local, 'connection'):
-            _local.connection = sqlite3.connect(DB_PATH)
+            _local.connection = sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT)
         return _local.connection
     else:
-        return sqlite3.connect(DB_PATH)
+        return sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT)
 
 
 def _check_column_exists(conn: sqlite3.Connection, table_name: str, column_name: str):
@@ -72,6 +76,107 @@ def _perform_maintenance(cur: sqlite3.Cursor):
     cur.execute('PRAGMA optimize')
     if mode == 'full':
         cur.execute('VACUUM')
+        if _fts_enabled:
+            # VACUUM can change the rowids the index refers to
+            cur.execute("INSERT INTO issues_fts(issues_fts) VALUES ('rebuild')")
+
+
+# full text index over name and issues, used for searches instead of scanning the table with LIKE '%value%'. the
+# trigram tokenizer matches arbitrary substrings of at least 3 characters, shorter values still use LIKE.
+_fts_enabled = False
+FTS_COLUMNS = ['name', 'issues']
+FTS_MIN_LENGTH = 3
+
+
+def _init_fts(cur: sqlite3.Cursor):
+    global _fts_enabled
+    try:
+        [[exists]] = cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'issues_fts'")
+        cur.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS issues_fts
+                        USING fts5(name, issues, content='issues', content_rowid='rowid', tokenize='trigram')''')
+    except sqlite3.OperationalError as e:
+        logger.info(f'Full text search not available, falling back to LIKE: {e}')
+        return
+    cur.execute('''
+                CREATE TRIGGER IF NOT EXISTS issues_fts_insert AFTER INSERT ON issues BEGIN
+                    INSERT INTO issues_fts(rowid, name, issues) VALUES (new.rowid, new.name, new.issues);
+                END''')
+    cur.execute('''
+                CREATE TRIGGER IF NOT EXISTS issues_fts_delete AFTER DELETE ON issues BEGIN
+                    INSERT INTO issues_fts(issues_fts, rowid, name, issues)
+                    VALUES ('delete', old.rowid, old.name, old.issues);
+                END''')
+    cur.execute('''
+                CREATE TRIGGER IF NOT EXISTS issues_fts_update AFTER UPDATE OF name, issues ON issues BEGIN
+                    INSERT INTO issues_fts(issues_fts, rowid, name, issues)
+                    VALUES ('delete', old.rowid, old.name, old.issues);
+                    INSERT INTO issues_fts(rowid, name, issues) VALUES (new.rowid, new.name, new.issues);
+                END''')
+    if not exists:
+        cur.execute("INSERT INTO issues_fts(issues_fts) VALUES ('rebuild')")
+    _fts_enabled = True
+
+
+def _migrate_to_file_ids(cur: sqlite3.Cursor):
+    # the issues are joined by the rowid, which needs to be an INTEGER PRIMARY KEY to survive VACUUM
+    cur.execute('ALTER TABLE issues RENAME TO issues_old')
+    _create_issues_table(cur)
+    cur.execute('''
+                INSERT INTO issues (id, library_id, path, name, mtime, last_update, issues, resolved)
+                SELECT rowid, library_id, path, name, mtime, last_update, issues, resolved
+                FROM issues_old''')
+    cur.execute('DROP TABLE issues_old')
+    # the triggers were dropped with the old table, the index is rebuilt by _init_fts
+    cur.execute('DROP TABLE IF EXISTS issues_fts')
+    cur.execute('DROP INDEX IF EXISTS idx_issues')
+
+
+def _create_issues_table(cur: sqlite3.Cursor):
+    cur.execute('''
+                CREATE TABLE IF NOT EXISTS issues
+                (
+                    id          INTEGER PRIMARY KEY,
+                    library_id  INTEGER NULL,
+                    path        TEXT    NOT NULL,
+                    name        TEXT    NOT NULL,
+                    mtime       INTEGER NOT NULL,
+                    last_update INTEGER NOT NULL,
+                    issues      TEXT    NOT NULL,
+                    resolved    INTEGER NOT NULL,
+                    UNIQUE (library_id, path)
+                )''')
+
+
+# The issues of a file are stored in file_issues, one row per issue type. The comma separated issues column of the
+# issues table is kept for display and the full text search, it is only written together with file_issues.
+def _init_issue_types(cur: sqlite3.Cursor):
+    [[exists]] = cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'file_issues'")
+    cur.execute('''
+                CREATE TABLE IF NOT EXISTS issue_types
+                (
+                    id   INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE
+                )''')
+    cur.execute('''
+                CREATE TABLE IF NOT EXISTS file_issues
+                (
+                    file_id       INTEGER NOT NULL,
+                    issue_type_id INTEGER NOT NULL,
+                    PRIMARY KEY (file_id, issue_type_id)
+                ) WITHOUT ROWID''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_file_issues_type ON file_issues (issue_type_id, file_id)')
+    cur.execute('''
+                CREATE TRIGGER IF NOT EXISTS issues_delete_file_issues AFTER DELETE ON issues BEGIN
+                    DELETE FROM file_issues WHERE file_id = old.id;
+                END''')
+    _issue_type_ids.update(cur.execute('SELECT name, id FROM issue_types'))
+    if not exists:
+        rows = cur.execute('SELECT id, issues FROM issues').fetchall()
+        cur.executemany('INSERT OR IGNORE INTO file_issues (file_id, issue_type_id) VALUES (?, ?)',
+                        [(file_id, type_id) for file_id, issues in rows
+                         for type_id in _get_issue_type_ids(cur, _split(issues))])
+        logger.info(f'Migrated the issues of {len(rows)} files')
 
 
 def _init():
@@ -82,69 +187,129 @@ def _init():
         cur = conn.cursor()
         if not _check_column_exists(conn, 'issues', 'name'):
             cur.execute('DROP TABLE IF EXISTS issues')
+        elif not _check_column_exists(conn, 'issues', 'id'):
+            _migrate_to_file_ids(cur)
 
-        cur.execute('''
-                    CREATE TABLE IF NOT EXISTS issues
-                    (
-                        library_id  INTEGER NULL,
-                        path        TEXT    NOT NULL,
-                        name        TEXT    NOT NULL,
-                        mtime       INTEGER NOT NULL,
-                        last_update INTEGER NOT NULL,
-                        issues      TEXT    NOT NULL,
-                        resolved    INTEGER NOT NULL,
-                        PRIMARY KEY (library_id, path)
-                    )''')
+        _create_issues_table(cur)
 
         cur.execute('CREATE INDEX IF NOT EXISTS idx_last_update ON issues (last_update)')
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_issues ON issues (issues)')
         cur.execute('CREATE INDEX IF NOT EXISTS idx_name ON issues (name)')
         cur.execute('CREATE INDEX IF NOT EXISTS idx_resolved_name ON issues (resolved, name)')
 
-        _perform_maintenance(cur)
+        _init_issue_types(cur)
+        _init_fts(cur)
+
+    startup.run_in_background(f'{PLUGIN_ID}-maintenance', _maintain)
+
+
+def _maintain():
+    with _get_connection() as conn:
+        _perform_maintenance(conn.cursor())
+
+
+_issue_type_ids: dict[str, int] = {}
+_issue_type_lock = threading.Lock()
+
+
+def _split(issues: str) -> list[str]:
+    return list(dict.fromkeys(issue for issue in issues.split(',') if issue))
+
+
+def _get_issue_type_ids(cur: sqlite3.Cursor, names: list[str]) -> list[int]:
+    ids = []
+    with _issue_type_lock:
+        for name in names:
+            if name not in _issue_type_ids:
+                cur.execute('INSERT INTO issue_types (name) VALUES (?) ON CONFLICT (name) DO NOTHING', (name,))
+                [[_issue_type_ids[name]]] = cur.execute('SELECT id FROM issue_types WHERE name = ?', (name,))
+            ids.append(_issue_type_ids[name])
+    return ids
 
 
 _init()
 
 
+def _update_issues_column(cur: sqlite3.Cursor, file_ids: list[int], now: int):
+    cur.executemany('''
+                    UPDATE issues
+                    SET (issues, last_update) = ((SELECT group_concat(name, ',')
+                                                  FROM (SELECT t.name
+                                                        FROM file_issues fi
+                                                                 JOIN issue_types t ON t.id = fi.issue_type_id
+                                                        WHERE fi.file_id = ?
+                                                        ORDER BY t.id)), ?)
+                    WHERE id = ?''', [(file_id, now, file_id) for file_id in file_ids])
+
+
+def _insert(cur: sqlite3.Cursor, library_id: int, path: str, mtime: int, issues: str, now: int):
+    names = _split(issues)
+    [[file_id]] = cur.execute('''
+                              INSERT INTO issues (library_id, path, name, mtime, last_update, issues, resolved)
+                              VALUES (?, ?, ?, ?, ?, ?, ?)
+                              ON CONFLICT(library_id, path) DO UPDATE
+                                  SET (name, mtime, last_update, issues, resolved) = (EXCLUDED.name,
+                                                                                      EXCLUDED.mtime,
+                                                                                      EXCLUDED.last_update,
+                                                                                      EXCLUDED.issues,
+                                                                                      EXCLUDED.resolved)
+                              RETURNING id
+                              ''', (library_id, path, os.path.basename(path), mtime, now, ','.join(names), 0))
+    cur.execute('DELETE FROM file_issues WHERE file_id = ?', (file_id,))
+    cur.executemany('INSERT INTO file_issues (file_id, issue_type_id) VALUES (?, ?)',
+                    [(file_id, type_id) for type_id in _get_issue_type_ids(cur, names)])
+
+
+def _append_issues_many(cur: sqlite3.Cursor, rows: list[tuple[int, str, int, str]], now: int):
+    # new files get their issues column right away, existing files only if an issue was added
+    changed = []
+    for library_id, path, mtime, issues in rows:
+        names = _split(issues)
+        if not names:
+            continue
+        row = cur.execute('''
+                          INSERT INTO issues (library_id, path, name, mtime, last_update, issues, resolved)
+                          VALUES (?, ?, ?, ?, ?, ?, 0)
+                          ON CONFLICT(library_id, path) DO NOTHING
+                          RETURNING id
+                          ''', (library_id, path, os.path.basename(path), mtime, now, ','.join(names))).fetchone()
+        if row is not None:
+            [file_id] = row
+        else:
+            [[file_id]] = cur.execute('SELECT id FROM issues WHERE library_id = ? AND path = ?', (library_id, path))
+        cur.executemany('INSERT OR IGNORE INTO file_issues (file_id, issue_type_id) VALUES (?, ?)',
+                        [(file_id, type_id) for type_id in _get_issue_type_ids(cur, names)])
+        if row is None and cur.rowcount > 0:
+            changed.append(file_id)
+    if changed:
+        _update_issues_column(cur, changed, now)
+
+
 def insert(library_id: int, path: str, mtime: int, issues: str):
-    now = int(time.time())
+    '''Insert a file, or replace its issues.'''
     with _get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute('''
-                    INSERT INTO issues (library_id, path, name, mtime, last_update, issues, resolved)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(library_id, path) DO UPDATE
-                        SET (name, mtime, last_update, issues, resolved) = (EXCLUDED.name,
-                                                                            EXCLUDED.mtime,
-                                                                            EXCLUDED.last_update,
-                                                                            EXCLUDED.issues,
-                                                                            EXCLUDED.resolved)
-                    ''', (library_id, path, os.path.basename(path), mtime, now, issues, 0))
+        _insert(conn.cursor(), library_id, path, mtime, issues, int(time.time()))
+    _invalidate()
 
 
 def append_issues(library_id: int, path: str, mtime: int, issues: str):
+    append_issues_many([(library_id, path, mtime, issues)])
+
+
+def append_issues_many(rows: list[tuple[int, str, int, str]]):
+    '''Append issues of many files in a single transaction, rows are (library_id, path, mtime, issues).'''
+    with _get_connection() as conn:
+        _append_issues_many(conn.cursor(), rows, int(time.time()))
+    _invalidate()
+
+
+def apply(deletes: list[tuple[int, str]], appends: list[tuple[int, str, int, str]]):
+    '''Delete files and then append issues in a single transaction, deletes are (library_id, path).'''
     now = int(time.time())
     with _get_connection() as conn:
         cur = conn.cursor()
-        cur.execute('''SELECT issues
-                       FROM issues
-                       WHERE library_id = ?
-                         and path = ?''', (library_id, path))
-        row = cur.fetchone()
-        if row:
-            current_issues = row[0].split(',')
-            initial_len = len(current_issues)
-            for issue in issues.split(','):
-                if not issue in current_issues:
-                    current_issues.append(issue)
-            if len(current_issues) > initial_len:
-                cur.execute('''UPDATE issues
-                               SET (issues, last_update) = (?, ?)
-                               WHERE library_id = ?
-                                 AND path = ?''', (','.join(current_issues), now, library_id, path))
-            return
-    insert(library_id, path, mtime, issues)
+        cur.executemany('DELETE FROM issues WHERE library_id = ? AND path = ?', deletes)
+        _append_issues_many(cur, appends, now)
+    _invalidate()
 
 
 @SQL('UPDATE issues SET resolved = ? WHERE rowid = ?')
@@ -163,14 +328,177 @@ def update_mtime(mtime: int, library_id: int, path: str):
 
 
 def rename(library_id: int, path: str, new_path: str, mtime: int):
+    '''Move the issues of a file to its new path, replacing those of a file previously at new_path.'''
     with _get_connection() as conn:
         cur = conn.cursor()
-        cur.execute('SELECT issues FROM issues WHERE library_id = ? AND path = ?', (library_id, path))
-        row = cur.fetchone()
-        if not row:
-            return
-    delete(library_id, path)
-    insert(library_id, new_path, mtime, row[0])
+        cur.execute('DELETE FROM issues WHERE library_id = ? AND path = ?', (library_id, new_path))
+        cur.execute('UPDATE issues SET (path, name, mtime) = (?, ?, ?) WHERE library_id = ? AND path = ?',
+                    (new_path, os.path.basename(new_path), mtime, library_id, path))
+    _invalidate()
+
+
+def count_by_type(library_id: int = None, resolved: int = None) -> dict[str, int]:
+    '''Number of files with each issue type.'''
+    clauses = []
+    parameters = ()
+    if library_id is not None:
+        clauses.append('i.library_id = ?')
+        parameters += (library_id,)
+    if resolved is not None:
+        clauses.append('i.resolved = ?')
+        parameters += (resolved,)
+    where = f' WHERE {' AND '.join(clauses)}' if clauses else ''
+    join = ' JOIN issues i ON i.id = fi.file_id' if clauses else ''
+    with _get_connection() as conn:
+        cur = conn.execute(f'''
+                           SELECT t.name, COUNT(*)
+                           FROM file_issues fi
+                                    JOIN issue_types t ON t.id = fi.issue_type_id{join}{where}
+                           GROUP BY t.id
+                           ORDER BY t.id''', parameters)
+        return dict(cur.fetchall())
+
+
+def _type_clause(name: str, negate=False) -> tuple[str, tuple]:
+    exists = 'NOT EXISTS' if negate else 'EXISTS'
+    return (f'''{exists} (SELECT 1
+                          FROM file_issues fi
+                          WHERE fi.file_id = issues.id
+                            AND fi.issue_type_id = (SELECT id FROM issue_types WHERE name = ?))''', (name,))
+
+
+def find(with_types: list[str] = None, without_types: list[str] = None, library_id: int = None,
+         resolved: int = None) -> list[tuple[int, str]]:
+    '''(library_id, path) of the files with all issues of with_types and none of without_types.'''
+    clauses = []
+    parameters = ()
+    if library_id is not None:
+        clauses.append('library_id = ?')
+        parameters += (library_id,)
+    if resolved is not None:
+        clauses.append('resolved = ?')
+        parameters += (resolved,)
+    for name in with_types or []:
+        clause, params = _type_clause(name)
+        clauses.append(clause)
+        parameters += params
+    for name in without_types or []:
+        clause, params = _type_clause(name, negate=True)
+        clauses.append(clause)
+        parameters += params
+    where = f' WHERE {' AND '.join(clauses)}' if clauses else ''
+    with _get_connection() as conn:
+        return conn.execute(f'SELECT library_id, path FROM issues{where}', parameters).fetchall()
+
+
+def resolve_type(name: str, resolved: bool, library_id: int = None) -> int:
+    '''Mark all files with an issue type as (un)resolved, returns the number of files.'''
+    sql = '''UPDATE issues
+             SET resolved = ?
+             WHERE id IN (SELECT file_id
+                          FROM file_issues
+                          WHERE issue_type_id = (SELECT id FROM issue_types WHERE name = ?))'''
+    parameters = (int(resolved), name)
+    if library_id is not None:
+        sql += ' AND library_id = ?'
+        parameters += (library_id,)
+    with _get_connection() as conn:
+        count = conn.execute(sql, parameters).rowcount
+    _invalidate()
+    return count
+
+
+# Counts of the panel queries are cached until the next write. Pages are fetched with keyset pagination: the
+# (value, rowid) of the row before a page is remembered, and the page starts after it using the index of the ordered
+# column, instead of skipping OFFSET rows. These cursors stay valid seek keys when rows are written, only the offset
+# they were recorded at can drift by the rows inserted or deleted before them. The writer thread and the job queue write
+# constantly, so instead of dropping them on every write, cursors are dropped once they have seen writes and are older
+# than MAX_CURSOR_AGE. A page far from any cursor (e.g. jumping to the last page) is reached in hops of CURSOR_STRIDE
+# rows on the index, and a cursor is recorded after each hop. This costs the same as a single OFFSET, but any later page
+# of the query skips at most CURSOR_STRIDE rows.
+MAX_CACHED_QUERIES = 64
+MAX_CURSORS_PER_QUERY = 4096
+MAX_CURSOR_AGE = 30
+CURSOR_STRIDE = 1000
+
+
+class _Cursors:
+    def __init__(self):
+        self.generation = _generation
+        self.created = time.monotonic()
+        self.offsets: dict[int, tuple] = {}
+        '''offset of the first row of a page -> (value, rowid) of the row before it'''
+
+    def is_stale(self) -> bool:
+        return self.generation != _generation and time.monotonic() - self.created > MAX_CURSOR_AGE
+
+
+_cache_lock = threading.Lock()
+_counts: OrderedDict[tuple, int] = OrderedDict()
+_cursors: OrderedDict[tuple, _Cursors] = OrderedDict()
+_generation = 0
+
+
+def _invalidate():
+    global _generation
+    with _cache_lock:
+        _counts.clear()
+        _generation += 1
+
+
+def _cached_count(cur: sqlite3.Cursor, where: str, parameters: tuple) -> int:
+    key = (where, parameters)
+    with _cache_lock:
+        if key in _counts:
+            _counts.move_to_end(key)
+            return _counts[key]
+    [[count]] = cur.execute(f'SELECT COUNT(*) FROM issues{where}', parameters)
+    with _cache_lock:
+        _counts[key] = count
+        while len(_counts) > MAX_CACHED_QUERIES:
+            _counts.popitem(last=False)
+    return count
+
+
+def _get_cursors(key: tuple) -> _Cursors:
+    with _cache_lock:
+        cursors = _cursors.get(key)
+        if cursors is None or cursors.is_stale():
+            cursors = _Cursors()
+            _cursors[key] = cursors
+        _cursors.move_to_end(key)
+        while len(_cursors) > MAX_CACHED_QUERIES:
+            _cursors.popitem(last=False)
+        return cursors
+
+
+def _nearest_cursor(cursors: _Cursors, offset: int) -> tuple[int, Optional[tuple]]:
+    '''The closest cursor at or before offset, (0, None) for the start.'''
+    with _cache_lock:
+        base = max((o for o in cursors.offsets if o <= offset), default=0)
+        return base, cursors.offsets.get(base)
+
+
+def _put_cursor(cursors: _Cursors, offset: int, cursor: tuple):
+    with _cache_lock:
+        if len(cursors.offsets) < MAX_CURSORS_PER_QUERY:
+            cursors.offsets[offset] = cursor
+
+
+def _seek(cur: sqlite3.Cursor, where: str, parameters: tuple, order_column: str, order_by: str, desc: bool,
+          cursor: Optional[tuple], skip: int) -> Optional[tuple]:
+    '''(value, rowid) of the row skip rows after cursor, None if there are not enough rows.'''
+    if cursor is not None:
+        seek = f'({order_column}, rowid) {'<' if desc else '>'} (?, ?)'
+        where = f'{where} AND {seek}' if where else f' WHERE {seek}'
+        parameters += tuple(cursor)
+    cur.execute(f'SELECT {order_column}, rowid FROM issues{where}{order_by} LIMIT 1 OFFSET ?', parameters + (skip - 1,))
+    return cur.fetchone()
+
+
+def _fts_query(column: str, value: str) -> str:
+    value = value.replace('"', '""')
+    return f'{column} : "{value}"'
 
 
 def query(library_id: int = None, offset: int = None, limit: int = None, order=None, search: list = None,
@@ -184,57 +512,85 @@ def query(library_id: int = None, offset: int = None, limit: int = None, order=N
             if not column in valid_columns:
                 raise ValueError(f"Invalid column '{column}'")
 
-    query_string = f'SELECT {', '.join(columns)} FROM issues'
-    count_query_string = 'SELECT COUNT(*) FROM issues'
+    clauses = []
     parameters = ()
-    total, filtered = 0, 0
-
-    sep = ' WHERE'
     if library_id is not None:
-        count_query_string += f'{sep} library_id = ?'
-        query_string += f'{sep} library_id = ?'
-        sep = ' AND'
+        clauses.append('library_id = ?')
         parameters += (library_id,)
 
     if resolved is not None:
-        count_query_string += f'{sep} resolved = ?'
-        query_string += f'{sep} resolved = ?'
-        sep = ' AND'
+        clauses.append('resolved = ?')
         parameters += (resolved,)
 
+    # filters without the search, for the total count
+    total_where = f' WHERE {' AND '.join(clauses)}' if clauses else ''
+    total_parameters = parameters
+
+    for s in search or []:
+        column = columns[s.get('column')]
+        value = s.get('value')
+        if column == 'issues' and value in _issue_type_ids:
+            clause, params = _type_clause(value)
+            clauses.append(clause)
+            parameters += params
+        elif _fts_enabled and column in FTS_COLUMNS and len(value) >= FTS_MIN_LENGTH:
+            clauses.append('rowid IN (SELECT rowid FROM issues_fts WHERE issues_fts MATCH ?)')
+            parameters += (_fts_query(column, value),)
+        else:
+            clauses.append(f'{column} LIKE ?')
+            parameters += (f'%{value}%',)
+
+    where = f' WHERE {' AND '.join(clauses)}' if clauses else ''
+
     with _get_connection() as conn:
         cur = conn.cursor()
 
+        total, filtered = 0, 0
         if fetch_total:
-            [[total]] = cur.execute(count_query_string, parameters)
-            filtered = total
-
-        if search:
-            for s in search:
-                column = columns[s.get('column')]
-                parameters += (f'%{s.get('value')}%',)
-                query_string += f'{sep} {column} LIKE ?'
-                count_query_string += f'{sep} {column} LIKE ?'
-                sep = ' AND'
-            if fetch_total:
-                [[filtered]] = cur.execute(count_query_string, parameters)
-
-        if order is not None:
-            query_string += f' ORDER BY {columns[order.get('column')]}'
-            if order.get('dir') == 'desc':
-                query_string += ' DESC'
-
-        if limit is not None:
-            query_string += f' LIMIT {limit}'
-
-        if offset is not None:
-            query_string += f' OFFSET {offset}'
-
+            total = _cached_count(cur, total_where, total_parameters)
+            filtered = _cached_count(cur, where, parameters) if where != total_where else total
+
+        order_column = columns[order.get('column')] if order is not None else 'rowid'
+        desc = order is not None and order.get('dir') == 'desc'
+        direction = ' DESC' if desc else ''
+        order_by = f' ORDER BY {order_column}{direction}, rowid{direction}'
+
+        # the key of the row before the page
+        cursors = _get_cursors((where, parameters, order_column, desc))
+        offset = offset or 0
+        base, cursor = _nearest_cursor(cursors, offset)
+        while base < offset:
+            # skip the rows between the nearest cursor and the page, recording cursors on the way
+            skip = min(offset - base, CURSOR_STRIDE)
+            cursor = _seek(cur, where, parameters, order_column, order_by, desc, cursor, skip)
+            if cursor is None:
+                return ([], total, filtered) if fetch_total else []
+            base += skip
+            _put_cursor(cursors, base, cursor)
+
+        query_string = f'SELECT {', '.join(columns)}, {order_column}, rowid FROM issues'
+        query_parameters = parameters
+        if cursor is not None:
+            seek = f'({order_column}, rowid) {'<' if desc else '>'} (?, ?)'
+            query_string += f'{where} AND {seek}' if where else f' WHERE {seek}'
+            query_parameters += tuple(cursor)
+        else:
+            query_string += where
+        query_string += order_by
+        if limit is not None and limit >= 0:
+            query_string += f' LIMIT {int(limit)}'
+
+        rows = cur.execute(query_string, query_parameters).fetchall()
+        if rows and limit is not None and limit >= 0:
+            _put_cursor(cursors, offset + len(rows), tuple(rows[-1][-2:]))
+
+        num_columns = len(columns)
         if row_factory is not None:
-            cur.row_factory = row_factory
-        cur.execute(query_string, parameters)
+            rows = [row_factory(cur, row[:num_columns]) for row in rows]
+        else:
+            rows = [row[:num_columns] for row in rows]
 
         if fetch_total:
-            return cur.fetchall(), total, filtered
+            return rows, total, filtered
 
-        return cur.fetchall()
\ No newline at end of file
+        return rows
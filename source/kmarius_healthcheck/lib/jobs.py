@@ -0,0 +1,245 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+from kmarius_library.lib import startup
+
+from . import logger, PLUGIN_ID
+from . import writer
+from .issues import DB_PATH
+
+# Expensive checks are not run in the file test, which only enqueues (library_id, path, mtime). A small pool of
+# background threads works through the queue when the system is idle, highest priority and oldest first. The queue is
+# stored in issues.db so it survives restarts. Issues are handed to the writer thread like those of the file test, so
+# that a delete by the file test of a changed file is not followed by stale issues; finished jobs are removed from the
+# queue in batches.
+
+THREAD_NAME = PLUGIN_ID.replace('_', '-')
+
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 10
+IDLE_POLL_INTERVAL = 30
+EMPTY_POLL_INTERVAL = 5
+
+Check = Callable[[int, str], Optional[list[str]]]
+'''runs the deferred checks of a file and returns its issues, None if the file could not be checked'''
+
+_local = threading.local()
+
+
+class StoppableThread(threading.Thread):
+    '''Thread class with a stop() method. The thread itself has to check
+    regularly for the stopped() condition.'''
+
+    def __init__(self, *args, **kwargs):
+        super(StoppableThread, self).__init__(*args, **kwargs)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def sleep(self, seconds: float):
+        '''Sleep for some time, or until the thread is stopped.'''
+        return self._stop_event.wait(seconds)
+
+
+# NOTE: only reuse in short-lived threads like FileTester
+def _get_connection(reuse_connection=False) -> sqlite3.Connection:
+    if reuse_connection:
+        if not hasattr(_local, 'connection'):
+            _local.connection = sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT)
+        return _local.connection
+    else:
+        return sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT)
+
+
+def _init():
+    with _get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('''
+                    CREATE TABLE IF NOT EXISTS jobs
+                    (
+                        library_id INTEGER NOT NULL,
+                        path       TEXT    NOT NULL,
+                        mtime      INTEGER NOT NULL,
+                        priority   INTEGER NOT NULL DEFAULT 0,
+                        created    INTEGER NOT NULL,
+                        PRIMARY KEY (library_id, path)
+                    )''')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_jobs_order ON jobs (priority DESC, created)')
+
+
+_init()
+
+
+def enqueue(library_id: int, path: str, mtime: int, priority: int = 0, reuse_connection=False):
+    '''Queue a file for the deferred checks, replacing a pending job of an older version of the file.'''
+    with _get_connection(reuse_connection) as conn:
+        conn.execute('''
+                     INSERT INTO jobs (library_id, path, mtime, priority, created)
+                     VALUES (?, ?, ?, ?, ?)
+                     ON CONFLICT(library_id, path) DO UPDATE
+                         SET (mtime, priority) = (EXCLUDED.mtime, MAX(priority, EXCLUDED.priority))
+                     ''', (library_id, path, mtime, priority, int(time.time())))
+
+
+def dequeue(library_id: int, path: str, reuse_connection=False):
+    with _get_connection(reuse_connection) as conn:
+        conn.execute('DELETE FROM jobs WHERE library_id = ? AND path = ?', (library_id, path))
+
+
+def count() -> int:
+    with _get_connection() as conn:
+        [[n]] = conn.execute('SELECT COUNT(*) FROM jobs')
+        return n
+
+
+class _Runner:
+    def __init__(self):
+        self.check: Optional[Check] = None
+        self.lock = threading.Lock()
+        self.paused = False
+        self.idle_load = 0.5
+        self.in_flight: set[tuple[int, str]] = set()
+        self.results: list[tuple[int, str, int]] = []
+        '''finished jobs, removed from the queue with the next flush'''
+        self.last_flush = time.time()
+        self.checked = 0
+        self.waiting_for_idle = False
+
+    def is_idle(self) -> bool:
+        try:
+            load = os.getloadavg()[0]
+        except OSError:
+            return True
+        return load / (os.cpu_count() or 1) < self.idle_load
+
+    def take(self) -> Optional[tuple[int, str, int]]:
+        with self.lock:
+            with _get_connection() as conn:
+                cur = conn.execute('SELECT library_id, path, mtime FROM jobs ORDER BY priority DESC, created')
+                for library_id, path, mtime in cur:
+                    if (library_id, path) not in self.in_flight:
+                        self.in_flight.add((library_id, path))
+                        return library_id, path, mtime
+        return None
+
+    def done(self, job: tuple[int, str, int], issues: Optional[list[str]]):
+        library_id, path, mtime = job
+        if issues:
+            try:
+                current_mtime = int(os.path.getmtime(path))
+            except OSError:
+                current_mtime = None
+            if current_mtime == mtime:
+                writer.append_issues(library_id, path, mtime, issues)
+            else:
+                # the file changed while it was checked, the file test queues it again
+                logger.debug(f'Discarding issues of a changed file: path={path}')
+        with self.lock:
+            self.results.append(job)
+            self.checked += 1
+            if len(self.results) >= BATCH_SIZE:
+                self._flush()
+
+    def flush(self, force=False):
+        with self.lock:
+            if self.results and (force or time.time() - self.last_flush >= FLUSH_INTERVAL):
+                self._flush()
+
+    def _flush(self):
+        results, self.results = self.results, []
+        self.last_flush = time.time()
+        try:
+            with _get_connection() as conn:
+                # jobs that were re-queued with a new mtime while being checked stay in the queue
+                conn.executemany('DELETE FROM jobs WHERE library_id = ? AND path = ? AND mtime = ?', results)
+        except Exception:
+            # removed with the next flush, the jobs stay in flight until then
+            self.results = results + self.results
+            raise
+        for library_id, path, _ in results:
+            self.in_flight.discard((library_id, path))
+        logger.debug(f'Removed {len(results)} finished jobs from the queue')
+
+    def step(self, thread: StoppableThread):
+        if self.paused or self.check is None:
+            thread.sleep(EMPTY_POLL_INTERVAL)
+            return
+
+        if not self.is_idle():
+            self.waiting_for_idle = True
+            self.flush(force=True)
+            thread.sleep(IDLE_POLL_INTERVAL)
+            return
+        self.waiting_for_idle = False
+
+        job = self.take()
+        if job is None:
+            self.flush(force=True)
+            thread.sleep(EMPTY_POLL_INTERVAL)
+            return
+
+        library_id, path, mtime = job
+        issues = None
+        try:
+            if os.path.exists(path) and int(os.path.getmtime(path)) == mtime:
+                issues = self.check(library_id, path)
+        except Exception as e:
+            logger.error(f'Healthcheck failed: path={path} error={e}')
+        self.done(job, issues)
+        self.flush()
+
+    def main(self):
+        thread = threading.current_thread()
+        while not thread.stopped():
+            try:
+                self.step(thread)
+            except Exception as e:
+                # e.g. the database is locked or the disk is full, finished jobs are kept for the next flush
+                logger.error(f'Background healthcheck failed: {e}')
+                thread.sleep(EMPTY_POLL_INTERVAL)
+        try:
+            self.flush(force=True)
+        except Exception as e:
+            logger.error(f'Could not remove {len(self.results)} finished jobs from the queue: {e}')
+
+
+_runner = _Runner()
+
+
+def start(check: Check, num_threads: int, idle_load: float):
+    '''
+    (Re-)start the background threads, stopping those of a previous load of the plugin. They are not waited for, a
+    thread in the middle of a check finishes it and writes its results before it exits.
+    '''
+    for thread in threading.enumerate():
+        if thread.name.startswith(THREAD_NAME) and hasattr(thread, 'stop') and not thread.stopped():
+            thread.stop()
+    _runner.check = check
+    _runner.idle_load = idle_load
+    for i in range(max(1, num_threads)):
+        StoppableThread(target=_runner.main, name=f'{THREAD_NAME}-{i}', daemon=True).start()
+
+
+def pause():
+    _runner.paused = True
+
+
+def resume():
+    _runner.paused = False
+
+
+def get_status() -> dict:
+    return {
+        'pending': count(),
+        'running': len(_runner.in_flight) - len(_runner.results),
+        'checked': _runner.checked,
+        'paused': _runner.paused,
+        'waiting_for_idle': _runner.waiting_for_idle,
+    }
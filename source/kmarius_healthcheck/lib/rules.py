@@ -0,0 +1,159 @@
+import sqlite3
+import threading
+import time
+from typing import Callable, Collection, NamedTuple, Optional
+
+from kmarius_library.lib import probes, startup
+
+from . import logger
+from .issues import DB_PATH
+
+# Each healthcheck is a rule that declares the inputs it needs and how expensive it is. The result of every rule is
+# stored separately, keyed by path, mtime and the version of the rule, so only rules without a current result run:
+# adding a rule or bumping its version re-runs just that rule. Cheap rules run in the file test, expensive ones are
+# deferred to the background job queue.
+
+CHEAP = 'cheap'
+'''only needs the ffprobe result of the file test'''
+EXPENSIVE = 'expensive'
+'''runs other probes or decodes the file'''
+
+INPUTS = ['ffprobe', 'mediainfo', 'samples']
+'''samples: the rule decodes parts of the file itself'''
+
+
+class Rule(NamedTuple):
+    name: str
+    '''the issue reported if the check returns True'''
+    version: int
+    inputs: tuple[str, ...]
+    cost: str
+    check: Callable[[int, str, dict], bool]
+    '''called with the library id, the path and the probe results of its inputs'''
+    enabled: Optional[Callable[[int], bool]] = None
+    '''whether the rule applies to a library, e.g. depending on a setting'''
+
+    def is_enabled(self, library_id: int) -> bool:
+        return self.enabled is None or self.enabled(library_id)
+
+
+_rules: dict[str, Rule] = {}
+
+_local = threading.local()
+
+
+def rule(name: str, version: int = 1, inputs: Collection[str] = ('ffprobe',), cost: str = CHEAP,
+         enabled: Callable[[int], bool] = None):
+    '''Decorator that registers a check function as a rule.'''
+    for input in inputs:
+        if input not in INPUTS:
+            raise ValueError(f"Unknown input '{input}'")
+    if cost not in [CHEAP, EXPENSIVE]:
+        raise ValueError(f"Unknown cost class '{cost}'")
+
+    def decorator(func: Callable[[int, str, dict], bool]):
+        _rules[name] = Rule(name, version, tuple(inputs), cost, func, enabled)
+        return func
+
+    return decorator
+
+
+def get_rules(cost: str = None) -> list[Rule]:
+    return [r for r in _rules.values() if cost is None or r.cost == cost]
+
+
+# NOTE: only reuse in short-lived threads like FileTester
+def _get_connection(reuse_connection=False) -> sqlite3.Connection:
+    if reuse_connection:
+        if not hasattr(_local, 'connection'):
+            _local.connection = sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT)
+        return _local.connection
+    else:
+        return sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT)
+
+
+def _init():
+    with _get_connection() as conn:
+        conn.execute('''
+                     CREATE TABLE IF NOT EXISTS rule_results
+                     (
+                         path    TEXT    NOT NULL,
+                         rule    TEXT    NOT NULL,
+                         mtime   INTEGER NOT NULL,
+                         version INTEGER NOT NULL,
+                         result  INTEGER NOT NULL,
+                         updated INTEGER NOT NULL,
+                         PRIMARY KEY (path, rule)
+                     )''')
+
+
+_init()
+
+
+def _get_results(path: str, mtime: int, reuse_connection=False) -> dict[str, bool]:
+    '''Current results of the registered rules.'''
+    with _get_connection(reuse_connection) as conn:
+        cur = conn.execute('SELECT rule, version, result FROM rule_results WHERE path = ? AND mtime = ?',
+                           (path, mtime))
+        return {name: bool(result) for name, version, result in cur
+                if name in _rules and _rules[name].version == version}
+
+
+def _put_results(path: str, mtime: int, results: dict[str, bool], reuse_connection=False):
+    now = int(time.time())
+    with _get_connection(reuse_connection) as conn:
+        conn.executemany('''
+                         INSERT INTO rule_results (path, rule, mtime, version, result, updated)
+                         VALUES (?, ?, ?, ?, ?, ?)
+                         ON CONFLICT (path, rule) DO UPDATE
+                             SET (mtime, version, result, updated) = (EXCLUDED.mtime, EXCLUDED.version,
+                                                                      EXCLUDED.result, EXCLUDED.updated)
+                         ''', [(path, name, mtime, _rules[name].version, int(result), now)
+                               for name, result in results.items()])
+
+
+def forget(path: str):
+    with _get_connection() as conn:
+        conn.execute('DELETE FROM rule_results WHERE path = ?', (path,))
+
+
+def _load_input(name: str, path: str, inputs: dict, reuse_connection: bool) -> Optional[dict]:
+    if name == 'samples':
+        return {}
+    if inputs.get(name) is None:
+        inputs[name] = probes.get(name, path, reuse_connection=reuse_connection)
+    return inputs[name]
+
+
+def evaluate(library_id: int, path: str, mtime: int, costs: Collection[str], inputs: dict = None,
+             reuse_connection=False) -> tuple[list[str], list[Rule]]:
+    '''
+    Run the enabled rules of the given cost classes that have no current result. Returns the issues found by all
+    enabled rules with a current result, and the rules that still have to run.
+    '''
+    inputs = {} if inputs is None else inputs
+    results = _get_results(path, mtime, reuse_connection=reuse_connection)
+
+    enabled = [r for r in _rules.values() if r.is_enabled(library_id)]
+    pending = []
+    new_results = {}
+    for r in enabled:
+        if r.name in results:
+            continue
+        if r.cost not in costs:
+            pending.append(r)
+            continue
+        args = {name: _load_input(name, path, inputs, reuse_connection) for name in r.inputs}
+        if any(arg is None for arg in args.values()):
+            logger.error(f'Missing input for rule {r.name}: path={path}')
+            continue
+        try:
+            new_results[r.name] = r.check(library_id, path, args)
+        except Exception as e:
+            logger.error(f'Rule {r.name} failed: path={path} error={e}')
+
+    if new_results:
+        _put_results(path, mtime, new_results, reuse_connection=reuse_connection)
+        results.update(new_results)
+
+    return [r.name for r in enabled if results.get(r.name)], pending
@@ -0,0 +1,164 @@
+import math
+import os
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from kmarius_library.lib import io_governor, startup
+
+from . import logger
+from .issues import DB_PATH
+
+# Deep verification decodes all audio and video of a file and records every error ffmpeg reports. The file is split
+# into time segments of roughly SEGMENT_BYTES that are decoded by parallel ffmpeg processes at the lowest CPU and I/O
+# priority. The bytes read per library are throttled, so that it can run continuously without starving the workers.
+
+SEGMENT_BYTES = 512 * 2 ** 20
+
+# errors of a file beyond this are counted, but not stored
+MAX_ERRORS = 100
+
+_local = threading.local()
+
+
+class DecodeError(NamedTuple):
+    timestamp: float
+    '''seconds from the start of the file'''
+    message: str
+
+
+# NOTE: only reuse in short-lived threads like FileTester
+def _get_connection(reuse_connection=False) -> sqlite3.Connection:
+    if reuse_connection:
+        if not hasattr(_local, 'connection'):
+            _local.connection = sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT)
+        return _local.connection
+    else:
+        return sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT)
+
+
+def _init():
+    with _get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('''
+                    CREATE TABLE IF NOT EXISTS decode_errors
+                    (
+                        path      TEXT    NOT NULL,
+                        mtime     INTEGER NOT NULL,
+                        timestamp REAL    NOT NULL,
+                        message   TEXT    NOT NULL
+                    )''')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_decode_errors_path ON decode_errors (path)')
+
+
+_init()
+
+
+def put_errors(path: str, mtime: int, errors: list[DecodeError]):
+    with _get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('DELETE FROM decode_errors WHERE path = ?', (path,))
+        cur.executemany('INSERT INTO decode_errors (path, mtime, timestamp, message) VALUES (?, ?, ?, ?)',
+                        [(path, mtime, e.timestamp, e.message) for e in errors[:MAX_ERRORS]])
+
+
+def get_errors(path: str) -> list[DecodeError]:
+    with _get_connection() as conn:
+        cur = conn.execute('SELECT timestamp, message FROM decode_errors WHERE path = ? ORDER BY timestamp', (path,))
+        return [DecodeError(*row) for row in cur]
+
+
+def forget(path: str):
+    with _get_connection() as conn:
+        conn.execute('DELETE FROM decode_errors WHERE path = ?', (path,))
+
+
+class _Throttle:
+    '''Limits the average rate at which bytes are read, shared by all threads verifying files of a library.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_free = 0.0
+
+    def acquire(self, num_bytes: int, bytes_per_second: float):
+        if bytes_per_second <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_free)
+            self.next_free = start + num_bytes / bytes_per_second
+        if start > now:
+            time.sleep(start - now)
+
+
+_throttles: dict[int, _Throttle] = {}
+_throttles_lock = threading.Lock()
+
+
+def _get_throttle(library_id: int) -> _Throttle:
+    with _throttles_lock:
+        if library_id not in _throttles:
+            _throttles[library_id] = _Throttle()
+        return _throttles[library_id]
+
+
+def _low_priority() -> list[str]:
+    command = []
+    if shutil.which('nice'):
+        command += ['nice', '-n', '19']
+    if shutil.which('ionice'):
+        command += ['ionice', '-c', '3']
+    return command
+
+
+def _decode_segment(path: str, ss: float, t: float) -> list[DecodeError]:
+    # progress is written to stderr as well, errors are attributed to the last reported position
+    command = _low_priority() + [
+        'ffmpeg', '-hide_banner', '-nostdin', '-v', 'error', '-nostats', '-progress', 'pipe:2',
+        '-ss', f'{ss:.3f}', '-t', f'{t:.3f}', '-i', path,
+        '-map', '0:v?', '-map', '0:a?', '-f', 'null', '-',
+    ]
+    errors = []
+    position = 0.0
+    proc = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    for line in proc.stderr:
+        line = line.decode('utf-8', errors='replace').strip()
+        key, sep, value = line.partition('=')
+        if sep and ' ' not in key:
+            if key == 'out_time_us' and value.isdigit():
+                position = int(value) / 1_000_000
+            continue
+        if line:
+            errors.append(DecodeError(round(ss + position, 3), line))
+    if proc.wait() != 0 and not errors:
+        errors.append(DecodeError(ss, f'ffmpeg exited with code {proc.returncode}'))
+    return errors
+
+
+def verify(library_id: int, path: str, duration: float, parallel: int, bytes_per_second: float) -> list[DecodeError]:
+    '''Decode the complete file and return the errors, ordered by timestamp.'''
+    size = os.path.getsize(path)
+    num_segments = max(1, math.ceil(size / SEGMENT_BYTES)) if duration > 0 else 1
+    segment_duration = duration / num_segments if duration > 0 else 0
+    segment_bytes = size / num_segments
+    throttle = _get_throttle(library_id)
+
+    def run(i: int) -> list[DecodeError]:
+        throttle.acquire(segment_bytes, bytes_per_second)
+        with io_governor.reading(path):
+            if segment_duration:
+                # the last segment runs until the end, in case the duration is off
+                t = segment_duration if i < num_segments - 1 else duration
+                return _decode_segment(path, i * segment_duration, t)
+            return _decode_segment(path, 0, 1e9)
+
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        errors = [e for segment_errors in pool.map(run, range(num_segments)) for e in segment_errors]
+    logger.info(f'Verified {size / 2 ** 20:.0f} MiB in {num_segments} segments in {time.time() - t0:.0f}s, '
+                f'{len(errors)} errors - {path}')
+    return sorted(set(errors))
@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from . import logger, PLUGIN_ID
+from . import issues
+
+# File testers run in parallel and used to write their results in a transaction each, contending for the write lock of
+# issues.db. They now hand the writes to a single thread instead, which coalesces the operations on a path and commits
+# them in batches, every FLUSH_INTERVAL seconds or once BATCH_SIZE paths are pending. The thread exits when there is
+# nothing to write and is started again by the next write. A batch that fails because the database is locked (e.g. by a
+# VACUUM during maintenance) is put back and written with the next one instead of being lost.
+
+THREAD_NAME = f'{PLUGIN_ID.replace('_', '-')}-writer'
+
+FLUSH_INTERVAL = 0.5
+BATCH_SIZE = 500
+RETRY_DELAY = 5
+
+
+class _Op(NamedTuple):
+    delete: bool
+    '''remove the row of the path before appending'''
+    mtime: Optional[int] = None
+    issues: tuple[str, ...] = ()
+
+
+_cond = threading.Condition()
+_pending: dict[tuple[int, str], _Op] = {}
+_writing = False
+_flushing = 0
+_thread: Optional[threading.Thread] = None
+
+
+def _merge(previous: Optional[_Op], op: _Op) -> _Op:
+    if previous is not None and not op.delete:
+        # appends are merged, a previous delete still happens first
+        return _Op(previous.delete, op.mtime, tuple(dict.fromkeys(previous.issues + op.issues)))
+    return op
+
+
+def _submit(library_id: int, path: str, op: _Op):
+    global _thread
+    with _cond:
+        key = (library_id, path)
+        _pending[key] = _merge(_pending.get(key), op)
+        if len(_pending) >= BATCH_SIZE:
+            _cond.notify_all()
+        if _thread is None:
+            _thread = threading.Thread(target=_main, name=THREAD_NAME, daemon=True)
+            _thread.start()
+
+
+def append_issues(library_id: int, path: str, mtime: int, file_issues: list[str]):
+    _submit(library_id, path, _Op(False, mtime, tuple(file_issues)))
+
+
+def delete(library_id: int, path: str):
+    _submit(library_id, path, _Op(True))
+
+
+def flush(timeout: float = None) -> bool:
+    '''Wait until all writes submitted so far are committed, returns False on timeout.'''
+    global _flushing
+    with _cond:
+        _flushing += 1
+        try:
+            _cond.notify_all()
+            return _cond.wait_for(lambda: not _pending and not _writing, timeout)
+        finally:
+            _flushing -= 1
+
+
+def _write(batch: dict[tuple[int, str], _Op]):
+    deletes = [key for key, op in batch.items() if op.delete]
+    appends = [(library_id, path, op.mtime, ','.join(op.issues))
+               for (library_id, path), op in batch.items() if op.issues]
+    t0 = time.perf_counter()
+    issues.apply(deletes, appends)
+    logger.debug(f'Wrote {len(deletes)} deletes and {len(appends)} appends in {time.perf_counter() - t0:.3f}s')
+
+
+def _is_busy(e: sqlite3.OperationalError) -> bool:
+    return e.sqlite_errorcode & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+def _main():
+    global _pending, _writing, _thread
+    while True:
+        with _cond:
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(_pending) < BATCH_SIZE and not _flushing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                _cond.wait(remaining)
+            if not _pending:
+                _thread = None
+                _cond.notify_all()
+                return
+            batch, _pending = _pending, {}
+            _writing = True
+        try:
+            _write(batch)
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e):
+                logger.error(f'Could not write {len(batch)} healthcheck results: {e}')
+            else:
+                logger.warning(f'Could not write {len(batch)} healthcheck results, retrying in {RETRY_DELAY}s: {e}')
+                with _cond:
+                    # operations submitted in the meantime come after those of the failed batch
+                    for key, op in _pending.items():
+                        batch[key] = _merge(batch.get(key), op)
+                    _pending = batch
+                time.sleep(RETRY_DELAY)
+        except Exception as e:
+            logger.error(f'Could not write {len(batch)} healthcheck results: {e}')
+        finally:
+            with _cond:
+                _writing = False
+                _cond.notify_all()
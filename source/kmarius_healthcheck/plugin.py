@@ -1,142 +1,148 @@
 import json
-import re
 import os
-import subprocess
 import time
 from datetime import datetime
 import traceback
 import uuid
-from typing import Tuple
+from typing import Optional
 
 from unmanic.libs.unmodels import Libraries
 from unmanic.libs.unplugins.settings import PluginSettings
 
 from kmarius_healthcheck.lib.types import *
 from kmarius_healthcheck.lib import logger
-from kmarius_healthcheck.lib import issues as issues_db
+from kmarius_healthcheck.lib import issues as issues_db, cleanup, cropdetect, jobs, rules, verify, writer
+from kmarius_library.lib import probes, settings_cache
 
 
 class Settings(PluginSettings):
     settings = {
+        'background_threads': 1,
+        'idle_load': 0.5,
+        'deep_verify': False,
+        'deep_verify_parallel': 2,
+        'deep_verify_max_mib_per_s': 50,
     }
     form_settings = {
+        'background_threads': {
+            'label': 'Number of threads running expensive checks in the background',
+            'description': 'Truncation and black bar detection run in the background instead of during file tests. '
+                           'Changing this requires a restart.',
+        },
+        'idle_load': {
+            'label': 'Maximum load per CPU core for background checks',
+            'description': 'Background checks wait while the 1 minute load average per core is above this value.',
+        },
+        'deep_verify': {
+            'label': 'Deep verify',
+            'description': 'Decode every file completely in the background and report decoding errors.',
+        },
+        'deep_verify_parallel': {
+            'label': 'Number of segments of a file decoded in parallel',
+            'sub_setting': True,
+        },
+        'deep_verify_max_mib_per_s': {
+            'label': 'Maximum read rate of deep verification in MiB/s for this library (0 for no limit)',
+            'sub_setting': True,
+        },
     }
 
     def __init__(self, *args, **kwargs):
         super(Settings, self).__init__(*args, **kwargs)
 
 
-def _cropdetect(path: str, ss: int = None, t: int = None) -> Tuple[int, int]:
-    command = ['ffmpeg']
-    if ss is not None:
-        command += ['-ss', str(ss)]
-    if t is not None:
-        command += ['-t', str(t)]
-    command += ['-i', path, '-vf', 'cropdetect', '-f', 'null', '-']
+# rules in the order their issues are listed, bump the version when changing a check to re-run it on all files
 
-    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    out, _ = proc.communicate()
-
-    crops = {}
-    # rarely the output looks like crop=-XX:-YY:...
-    for crop in re.compile(r'crop=-?(\d+):-?(\d+):\d+:\d+').findall(out.decode('utf-8')):
-        if crop not in crops:
-            crops[crop] = 0
-        crops[crop] += 1
-
-    width, height = map(int, max(crops.items(), key=lambda x: x[1])[0])
-    return width, height
-
-
-def _has_black_bars(path: str, probe: dict) -> bool:
-    duration = int(float(probe['format']['duration']))
-
-    width, height = None, None
-    for stream in probe['streams']:
-        if stream['codec_type'] == 'video':
-            width = stream['width']
-            height = stream['height']
-            break
+@rules.rule('Truncated', inputs=['mediainfo'], cost=rules.EXPENSIVE)
+def _is_truncated(library_id: int, path: str, inputs: dict) -> bool:
+    mediainfo = inputs['mediainfo']
+    if 'extra' in mediainfo and 'IsTruncated' in mediainfo['extra']:
+        return mediainfo['extra']['IsTruncated'] == 'Yes'
+    return False
 
-    # detected dimensions often slightly differ from the real ones, but I've never seen it higher than 16 pixels
-    thresh = 16
 
-    if duration > 60:
-        crop_width, crop_height = _cropdetect(path, ss=30, t=30)
-        if not (width - crop_width > thresh or height - crop_height > thresh):
+@rules.rule('No audio')
+def _has_no_audio(library_id: int, path: str, inputs: dict) -> bool:
+    for stream in inputs['ffprobe']['streams']:
+        if stream['codec_type'] == 'audio':
             return False
+    return True
 
-    # check again 5 minutes in, if possible
-    ss, t = 300, 30
-    if duration < 330:
-        ss = duration - 30
-        t = None
-        if ss < 0:
-            ss = 0
 
-    crop_width, crop_height = _cropdetect(path, ss=ss, t=t)
-    return width - crop_width > thresh or height - crop_height > thresh
+@rules.rule('Stereo only')
+def _has_no_multichannel(library_id: int, path: str, inputs: dict) -> bool:
+    for stream in inputs['ffprobe']['streams']:
+        if stream['codec_type'] == 'audio':
+            if stream['channels'] > 2:
+                return False
+    return True
 
 
-def _has_video(probe: dict) -> bool:
-    for stream in probe['streams']:
+@rules.rule('No video')
+def _has_no_video(library_id: int, path: str, inputs: dict) -> bool:
+    for stream in inputs['ffprobe']['streams']:
         if stream['codec_type'] == 'video':
-            return True
-    return False
+            return False
+    return True
 
 
-def _has_audio(probe: dict) -> bool:
-    for stream in probe['streams']:
-        if stream['codec_type'] == 'audio':
-            return True
-    return False
+@rules.rule('Black bars', version=2, inputs=['ffprobe', 'samples'], cost=rules.EXPENSIVE)
+def _has_black_bars(library_id: int, path: str, inputs: dict) -> bool:
+    return cropdetect.has_black_bars(path, inputs['ffprobe'])
 
 
-def _has_multichannel(probe: dict) -> bool:
-    for stream in probe['streams']:
-        if stream['codec_type'] == 'audio':
-            if stream['channels'] > 2:
-                return True
-    return False
+def _deep_verify_enabled(library_id: int) -> bool:
+    return settings_cache.get(Settings, library_id).get_setting('deep_verify')
 
 
-def _is_truncated(mediainfo: dict) -> bool:
-    if 'extra' in mediainfo and 'IsTruncated' in mediainfo['extra']:
-        return mediainfo['extra']['IsTruncated'] == 'Yes'
-    return False
+@rules.rule('Decode errors', inputs=['ffprobe', 'samples'], cost=rules.EXPENSIVE, enabled=_deep_verify_enabled)
+def _has_decode_errors(library_id: int, path: str, inputs: dict) -> bool:
+    settings = settings_cache.get(Settings, library_id)
+    try:
+        duration = float(inputs['ffprobe']['format']['duration'])
+    except (KeyError, ValueError):
+        duration = 0.0
+    mtime = int(os.path.getmtime(path))
+    errors = verify.verify(library_id, path, duration, settings.get_int('deep_verify_parallel'),
+                           settings.get_float('deep_verify_max_mib_per_s') * 2 ** 20)
+    verify.put_errors(path, mtime, errors)
+    return len(errors) > 0
+
+
+def _run_deferred_checks(library_id: int, path: str) -> Optional[list[str]]:
+    # runs in the background threads of the job queue
+    mtime = int(os.path.getmtime(path))
+    file_issues, _ = rules.evaluate(library_id, path, mtime, [rules.CHEAP, rules.EXPENSIVE])
+    if file_issues:
+        logger.info(f'Issues for {path}: {', '.join(file_issues)}')
+    return file_issues
 
 
 def on_library_management_file_test(data: FileTestData, **kwargs):
     library_id = data['library_id']
     path = data['path']
-    probe = data['shared_info'].get('ffprobe')
-    mediainfo = data['shared_info'].get('mediainfo')
+    if 'ffprobe' not in data['shared_info']:
+        data['shared_info']['ffprobe'] = probes.get('ffprobe', path, reuse_connection=True)
+    probe = data['shared_info']['ffprobe']
+    if probe is None:
+        logger.error(f'Could not probe file: path={path}')
+        return
 
     # What do we do when the file is changed
 
-    file_issues = []
-
-    if _is_truncated(mediainfo):
-        file_issues.append('Truncated')
-
-    if not _has_audio(probe):
-        file_issues.append('No audio')
-
-    if not _has_multichannel(probe):
-        file_issues.append('Stereo only')
-
-    if not _has_video(probe):
-        file_issues.append('No video')
-
-    if _has_black_bars(path, probe):
-        file_issues.append('Black bars')
+    mtime = int(os.path.getmtime(path))
+    file_issues, pending = rules.evaluate(library_id, path, mtime, [rules.CHEAP], inputs={'ffprobe': probe},
+                                          reuse_connection=True)
 
     if not file_issues:
-        issues_db.delete(library_id, path, reuse_connection=True)
+        writer.delete(library_id, path)
     else:
         logger.info(f'Issues for {path}: {', '.join(file_issues)}')
-        mtime = int(os.path.getmtime(path))
-        issues_db.append_issues(library_id, path, mtime, ','.join(file_issues))
+        writer.append_issues(library_id, path, mtime, file_issues)
+
+    if pending:
+        # expensive rules without a current result are run in the background
+        jobs.enqueue(library_id, path, mtime, reuse_connection=True)
 
 
 def emit_postprocessor_complete(data: PostprocessorCompleteData, **kwargs):
@@ -148,6 +154,8 @@ def emit_postprocessor_complete(data: PostprocessorCompleteData, **kwargs):
         src_path = data['source_data']['abspath']
 
         mtime = int(os.path.getmtime(path))
+        # results of the file test of the source may still be queued
+        writer.flush()
         if path == src_path:
             issues_db.update_mtime(mtime, library_id, src_path)
         else:
@@ -155,14 +163,11 @@ def emit_postprocessor_complete(data: PostprocessorCompleteData, **kwargs):
 
 
 def emit_scan_complete(data: ScanCompleteData, **kwargs):
-    # check against the library database and remove all issues of files not in the library
+    # remove everything stored about files that are not in the library anymore
     from kmarius_library.lib import timestamps
-    library_id = data['library_id']
-    # we could attach the timestamps database a perform a join
-    paths = issues_db.query(library_id=library_id, columns=['path'])
-    for path, in paths:
-        if timestamps.get(library_id, path) is None:
-            issues_db.delete(library_id, path)
+    writer.flush()
+    if not cleanup.start(data['library_id'], timestamps.DB_PATH):
+        logger.info(f'Cleanup of library {data['library_id']} still running')
 
 
 def render_frontend_panel(data: PanelData, **kwargs):
@@ -228,11 +233,12 @@ def _data_source(arguments: dict) -> dict:
             search.append({'column': 0, 'value': value})
 
     def factory(cur, row):
-        name, issues, last_update, resolved, path, rowid = row
+        name, issues, last_update, resolved, path, rowid, library_id = row
         return {
             'DT_RowData': {
                 'rowid': rowid,
                 'path': path,
+                'library_id': library_id,
             },
             'name': name,
             'issues': issues,
@@ -242,7 +248,8 @@ def _data_source(arguments: dict) -> dict:
 
     data, total, filtered = issues_db.query(library_id=library_id, offset=offset, limit=limit,
                                             order=order, search=search, resolved=resolved,
-                                            columns=['name', 'issues', 'last_update', 'resolved', 'path', 'rowid'],
+                                            columns=['name', 'issues', 'last_update', 'resolved', 'path', 'rowid',
+                                                     'library_id'],
                                             fetch_total=True, row_factory=factory)
 
     return {
@@ -257,6 +264,24 @@ def _resolve(body: dict):
     issues_db.resolve(body['resolve'], body['rowid'])
 
 
+def _resolve_type(body: dict):
+    library_id = body.get('library_id')
+    count = issues_db.resolve_type(body['issue'], body['resolve'],
+                                   library_id=int(library_id) if library_id is not None else None)
+    return {'success': True, 'count': count}
+
+
+# checks requested from the panel go before those of scanned files
+RECHECK_PRIORITY = 10
+
+
+def _recheck(body: dict):
+    for item in body['items']:
+        path = item['path']
+        if os.path.exists(path):
+            jobs.enqueue(int(item['library_id']), path, int(os.path.getmtime(path)), priority=RECHECK_PRIORITY)
+
+
 def render_plugin_api(data: PluginApiData, **kwargs):
     data['content_type'] = 'application/json'
     data['content'] = {}
@@ -278,6 +303,22 @@ def render_plugin_api(data: PluginApiData, **kwargs):
                 data['content'] = _data_source(arguments)
             case ('/resolve', 'POST'):
                 _resolve(body)
+            case ('/resolve-type', 'POST'):
+                data['content'] = _resolve_type(body)
+            case ('/issue-counts', 'GET'):
+                library_id = arguments.get('library_id')
+                data['content'] = issues_db.count_by_type(library_id=int(library_id) if library_id else None,
+                                                          resolved=0)
+            case ('/jobs/status', 'GET'):
+                data['content'] = jobs.get_status()
+            case ('/jobs/pause', 'POST'):
+                jobs.pause()
+            case ('/jobs/resume', 'POST'):
+                jobs.resume()
+            case ('/recheck', 'POST'):
+                _recheck(body)
+            case ('/decode-errors', 'GET'):
+                data['content'] = [e._asdict() for e in verify.get_errors(arguments['path'])]
             case path, method:
                 data['content'] = {
                     'success': False,
@@ -291,4 +332,9 @@ def render_plugin_api(data: PluginApiData, **kwargs):
             'success': False,
             'error': str(e),
             'trace': trace,
-        }
\ No newline at end of file
+        }
+
+
+_settings = Settings()
+jobs.start(_run_deferred_checks, int(_settings.get_setting('background_threads')),
+           float(_settings.get_setting('idle_load')))
@@ -4,7 +4,8 @@ from unmanic.libs.unplugins.settings import PluginSettings
 
 from kmarius_interleave_mp4.lib.types import *
 from kmarius_interleave_mp4.lib import logger, PLUGIN_ID
-from kmarius_interleave_mp4.lib.mp4box import MP4Box
+from kmarius_library.lib.mp4box import MP4Box
+from kmarius_library.lib import probes, settings_cache
 
 
 class Settings(PluginSettings):
@@ -37,8 +38,8 @@ def is_progressive(mp4box: dict) -> bool:
 
 def on_library_management_file_test(data: FileTestData, **kwargs):
     library_id = data['library_id']
-    settings = Settings(library_id=library_id)
-    param = int(settings.get_setting('interleave_parameter'))
+    settings = settings_cache.get(Settings, library_id)
+    param = settings.get_int('interleave_parameter')
 
     path = data['path']
 
@@ -49,7 +50,7 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
     if 'mp4box' in data['shared_info']:
         mp4box = data['shared_info']['mp4box']
     else:
-        mp4box = MP4Box.probe(path)
+        mp4box = probes.get('mp4box', path, reuse_connection=True)
         if mp4box is not None:
             data['shared_info']['mp4box'] = mp4box
 
@@ -66,8 +67,8 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
 
 
 def on_worker_process(data: ProcessItemData, **kwargs):
-    settings = Settings(library_id=data['library_id'])
-    param = int(settings.get_setting('interleave_parameter'))
+    settings = settings_cache.get(Settings, data['library_id'])
+    param = settings.get_int('interleave_parameter')
 
     file_in = data.get('file_in')
     file_out = data.get('file_out')
@@ -76,7 +77,7 @@ def on_worker_process(data: ProcessItemData, **kwargs):
     if ext != 'mp4':
         return
 
-    mp4box = MP4Box.probe(file_in)
+    mp4box = probes.get('mp4box', file_in, persist=file_in == data.get('original_file_path'))
     if mp4box is None:
         logger.error(f'No mp4box info: path={file_in}')
         return
@@ -94,8 +95,8 @@ def on_worker_process(data: ProcessItemData, **kwargs):
 def on_postprocessor_task_results(data: TaskResultData, **kwargs):
     if data['task_processing_success'] and data['file_move_processes_success']:
         library_id = data['library_id']
-        settings = Settings(library_id=library_id)
-        param = int(settings.get_setting('interleave_parameter'))
+        settings = settings_cache.get(Settings, library_id)
+        param = settings.get_int('interleave_parameter')
 
         paths = data['destination_files']
         if not paths:
@@ -107,7 +108,8 @@ def on_postprocessor_task_results(data: TaskResultData, **kwargs):
         if ext != 'mp4':
             return
 
-        mp4box = MP4Box.probe(path)
+        # the library plugin caches the result for the destination file, only one of us actually probes
+        mp4box = probes.get('mp4box', path)
         if mp4box is None:
             logger.error(f'No mp4box info: path={path}')
             return
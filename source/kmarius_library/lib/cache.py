@@ -6,7 +6,7 @@ import time
 from typing import Optional, Callable, Collection
 
 from unmanic.libs import common
-from . import PLUGIN_ID, logger
+from . import PLUGIN_ID, logger, startup
 
 # TODO: function to clean up orphans
 
@@ -25,12 +25,13 @@ def _check_column_exists(conn: sqlite3.Connection, table_name: str, column_name:
 
 # NOTE: only reuse in short-lived threads like FileTester
 def _get_connection(reuse_connection: bool = False) -> sqlite3.Connection:
+    _ensure_init()
     if reuse_connection:
         if not hasattr(_local, 'connection'):
-            _local.connection = sqlite3.connect(DB_PATH)
+            _local.connection = sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT)
         return _local.connection
     else:
-        return sqlite3.connect(DB_PATH)
+        return sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT)
 
 
 def _perform_maintenance(cur: sqlite3.Cursor):
@@ -51,70 +52,132 @@ def _perform_maintenance(cur: sqlite3.Cursor):
         cur.execute('VACUUM')
 
 
-def init(tables: list[str]):
+def _create_tables(conn: sqlite3.Connection, tables: Collection[str]):
+    cur = conn.cursor()
+    for table in tables:
+        cur.execute(f'''
+                       CREATE TABLE IF NOT EXISTS {table} (
+                           path TEXT PRIMARY KEY,
+                           mtime INTEGER NOT NULL,
+                           last_update INTEGER NOT NULL,
+                           data TEXT DEFAULT NULL,
+                           size INTEGER DEFAULT NULL
+                       )''')
+
+        if not _check_column_exists(conn, table, 'last_update'):
+            logger.info(f"Creating missing 'last_update' column in table {table}")
+            cur.execute(f'ALTER TABLE {table} ADD COLUMN last_update INTEGER NOT NULL DEFAULT 0')
+            cur.execute(f'UPDATE {table} SET last_update = mtime')
+
+        # the file size serves as a cheap fingerprint in addition to the mtime, NULL for old entries
+        if not _check_column_exists(conn, table, 'size'):
+            logger.info(f"Creating missing 'size' column in table {table}")
+            cur.execute(f'ALTER TABLE {table} ADD COLUMN size INTEGER DEFAULT NULL')
+
+        cur.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_last_update ON {table} (last_update)')
+
+
+_init_tables: list[str] = []
+_tables_ensured = set()
+_registered_tables: list[str] = []
+
+
+def _init():
     if not os.path.exists(os.path.dirname(DB_PATH)):
         os.makedirs(os.path.dirname(DB_PATH))
 
-    with _get_connection() as conn:
-        cur = conn.cursor()
-        for table in tables:
-            cur.execute(f'''
-                           CREATE TABLE IF NOT EXISTS {table} (
-                               path TEXT PRIMARY KEY,
-                               mtime INTEGER NOT NULL,
-                               last_update INTEGER NOT NULL,
-                               data TEXT DEFAULT NULL
-                           )''')
+    with sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT) as conn:
+        _create_tables(conn, _init_tables)
+    _tables_ensured.update(_init_tables)
+
+    startup.run_in_background(f'{PLUGIN_ID}-cache-maintenance', _maintain)
+
 
-            if not _check_column_exists(conn, table, 'last_update'):
-                logger.info(f"Creating missing 'last_update' column in table {table}")
-                cur.execute(f'ALTER TABLE {table} ADD COLUMN last_update INTEGER NOT NULL DEFAULT 0')
-                cur.execute(f'UPDATE {table} SET last_update = mtime')
+def _maintain():
+    with sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT) as conn:
+        _perform_maintenance(conn.cursor())
 
-            cur.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_last_update ON {table} (last_update)')
 
-        _perform_maintenance(cur)
+_ensure_init = startup.LazyInit('metadata cache', _init)
 
 
-def get(table: str, path: str, mtime: int = None, reuse_connection=False) -> Optional[dict]:
+def init(tables: list[str]):
+    '''Register the tables of the metadata providers, they are created when the cache is first used.'''
+    _registered_tables.extend(table for table in tables if table not in _registered_tables)
+    if _ensure_init.done:
+        ensure_tables(tables)
+    else:
+        _init_tables.extend(table for table in tables if table not in _init_tables)
+
+
+def register_table(table: str):
+    '''Register a table of another plugin, it is created, pruned and reset like the tables of the metadata providers.'''
+    init([table])
+
+
+def get_tables() -> list[str]:
+    '''All registered tables, e.g. to prune or reset the metadata of a path.'''
+    return list(_registered_tables)
+
+
+def ensure_tables(tables: Collection[str]):
+    '''Create missing tables without performing maintenance, e.g. when used from other plugins.'''
+    missing = [table for table in tables if table not in _tables_ensured]
+    if not missing:
+        return
+    if not os.path.exists(os.path.dirname(DB_PATH)):
+        os.makedirs(os.path.dirname(DB_PATH))
+    with _get_connection() as conn:
+        _create_tables(conn, missing)
+    _tables_ensured.update(missing)
+
+
+def get(table: str, path: str, mtime: int = None, size: int = None, reuse_connection=False) -> Optional[dict]:
+    query = f'SELECT data FROM {table} WHERE path = ?'
+    parameters = (path,)
+    if mtime:
+        query += ' AND mtime = ?'
+        parameters += (mtime,)
+    if size is not None:
+        query += ' AND (size IS NULL OR size = ?)'
+        parameters += (size,)
     with _get_connection(reuse_connection) as conn:
         cur = conn.cursor()
-        if mtime:
-            cur.execute(f'SELECT data FROM {table} WHERE path = ? AND mtime = ? LIMIT 1',
-                        (path, mtime))
-        else:
-            cur.execute(f'SELECT data FROM {table} WHERE path = ? LIMIT 1',
-                        (path,))
+        cur.execute(f'{query} LIMIT 1', parameters)
         row = cur.fetchone()
         if row is None or row[0] is None:
             return None
         return json.loads(row[0])
 
 
-def exists(table: str, path: str, mtime: int = None) -> bool:
+def exists(table: str, path: str, mtime: int = None, size: int = None) -> bool:
+    query = f'SELECT COUNT(*) FROM {table} WHERE path = ?'
+    parameters = (path,)
+    if mtime:
+        query += ' AND mtime = ?'
+        parameters += (mtime,)
+    if size is not None:
+        query += ' AND (size IS NULL OR size = ?)'
+        parameters += (size,)
     with _get_connection() as conn:
         cur = conn.cursor()
-        if mtime:
-            [[count]] = cur.execute(f'SELECT COUNT(*) FROM {table} WHERE path = ? AND mtime = ? LIMIT 1',
-                                    (path, mtime))
-        else:
-            [[count]] = cur.execute(f'SELECT COUNT(*) FROM {table} WHERE path = ? LIMIT 1',
-                                    (path,))
+        [[count]] = cur.execute(f'{query} LIMIT 1', parameters)
         return count > 0
 
 
-def put(table: str, path: str, mtime: int, data: dict, reuse_connection=False) -> None:
+def put(table: str, path: str, mtime: int, data: dict, size: int = None, reuse_connection=False) -> None:
     last_update = int(time.time())
     data = json.dumps(data)
     with _get_connection(reuse_connection) as conn:
         cur = conn.cursor()
         cur.execute(f'''
-                    INSERT INTO {table} (path, mtime, last_update, data)
-                    VALUES (?, ?, ?, ?)
+                    INSERT INTO {table} (path, mtime, last_update, data, size)
+                    VALUES (?, ?, ?, ?, ?)
                     ON CONFLICT (path) DO
                     UPDATE SET
-                        (mtime, last_update, data) = (EXCLUDED.mtime, EXCLUDED.last_update, EXCLUDED.data)
-                    ''', (path, mtime, last_update, data))
+                        (mtime, last_update, data, size) = (EXCLUDED.mtime, EXCLUDED.last_update, EXCLUDED.data,
+                                                            EXCLUDED.size)
+                    ''', (path, mtime, last_update, data, size))
 
 
 # resets timestamp only
@@ -23,7 +23,6 @@
 """
 
 from __future__ import absolute_import
-import warnings
 
 from .parser import Parser
 from .probe import Probe
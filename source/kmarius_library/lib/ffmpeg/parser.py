@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    plugins.parser.py
+
+    Written by:               Josh.5 <jsunnex@gmail.com>
+    Date:                     12 Aug 2021, (9:00 AM)
+
+    Copyright:
+        Copyright (C) 2021 Josh Sunnex
+
+        This program is free software: you can redistribute it and/or modify it under the terms of the GNU General
+        Public License as published by the Free Software Foundation, version 3.
+
+        This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the
+        implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+        for more details.
+
+        You should have received a copy of the GNU General Public License along with this program.
+        If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import math
+import re
+from logging import Logger
+
+from .probe import Probe
+
+# Progress is read from the stats line, which starts with frame= (or size= without video), e.g.
+#   frame=  240 fps= 48 q=28.0 size=    1024kB time=00:00:10.00 bitrate= 838.9kbits/s speed=1.99x
+# and from the machine-readable output of `-progress pipe:1`, which prints one known key=value pair per line. Other
+# lines, e.g. the x264 options (bitrate=2000) or metadata, can contain pairs of the same names and are ignored.
+_STATS_LINE = re.compile(r'^(frame|size)=')
+_KEY_VALUE = re.compile(r'(\w+)=\s*(\S+)')
+_PROGRESS_LINE = re.compile(r'^(\w+)=(\S+)$')
+_PROGRESS_KEYS = {'frame', 'fps', 'out_time', 'out_time_us', 'speed', 'bitrate', 'total_size'}
+
+
+class Parser(object):
+    """
+    Parser
+
+    Class to manage parsing the FFmpeg commandline output and return progress data for Unmanic.
+    """
+
+    percent = '0'
+    time = 0.0
+    frame = 0
+    fps = 0.0
+    speed = 0.0
+    bitrate = '0'
+    file_size = '0'
+
+    src_fps = None
+    duration = None
+    total_frames = None
+
+    def __init__(self, logger: Logger, duration=None, total_frames=None):
+        self.logger = logger
+        self.duration = duration
+        self.total_frames = total_frames
+
+    def set_probe(self, probe: Probe):
+        """
+        Set the information require to calculate progress from the file probe
+
+        :param probe:
+        :return:
+        """
+        # Get FPS from file probe info
+        self.src_fps = None
+        try:
+            file_probe_streams = probe.get('streams', [])
+            self.src_fps = self.frame_rate_to_float(file_probe_streams[0]['avg_frame_rate'])
+        except ZeroDivisionError:
+            # Warning, Cannot use input FPS
+            self.logger.warning('Cannot use input FPS for FFmpeg conversion progress')
+        except (KeyError, IndexError, ValueError):
+            # Warning, Cannot use input FPS
+            self.logger.warning('Cannot use input FPS for FFmpeg conversion progress - key not found in probe')
+        if self.src_fps == 0:
+            raise ValueError('Unexpected zero FPS')
+
+        # Get Duration from file probe info
+        self.duration = None
+        try:
+            file_probe_format = probe.get('format', {})
+            self.duration = float(file_probe_format['duration'])
+        except (KeyError, ValueError):
+            # Warning, Cannot use input Duration
+            self.logger.warning('Cannot use input Duration for FFmpeg conversion progress - key not found in probe')
+
+        if self.src_fps is None and self.duration is None:
+            raise ValueError('Unable to match against FPS or Duration.')
+
+        # If we have probed both the source FPS and total duration, then we can calculate the total frames
+        if self.duration and self.src_fps and self.duration > 0 and self.src_fps > 0:
+            self.total_frames = int(self.duration * self.src_fps)
+
+    def _update(self, key: str, value: str):
+        if key == 'frame':
+            frame = int(value)
+            if frame > self.frame:
+                self.frame = frame
+        elif key == 'fps':
+            self.fps = float(value)
+        elif key == 'time' or key == 'out_time':
+            # negative at the start of some encodes
+            self.time = max(self.time, self.time_string_to_seconds(value))
+        elif key == 'out_time_us':
+            self.time = max(self.time, int(value) / 1000000)
+        elif key == 'speed':
+            if value.endswith('x'):
+                self.speed = float(value[:-1])
+        elif key == 'bitrate':
+            if value != 'N/A':
+                self.bitrate = value if value.endswith('/s') else f'{value}/s'
+        elif key == 'size' or key == 'Lsize' or key == 'total_size':
+            self.file_size = value
+
+    def parse_progress(self, line_text):
+        """
+        Given a single line of STDOUT text, extract the progress as a percent value, plus speed, fps, bitrate and eta.
+
+        :param line_text:
+        :return:
+        """
+        pairs = []
+        if line_text and '=' in line_text:
+            line_text = line_text.strip()
+            if _STATS_LINE.match(line_text):
+                pairs = _KEY_VALUE.findall(line_text)
+            else:
+                match = _PROGRESS_LINE.match(line_text)
+                if match and match.group(1) in _PROGRESS_KEYS:
+                    pairs = [match.groups()]
+
+        if pairs:
+            for key, value in pairs:
+                try:
+                    self._update(key, value)
+                except ValueError:
+                    # e.g. N/A or negative timestamps at the start
+                    pass
+
+            # Update percent
+            _percent = None
+            if self.frame > 0 and self.total_frames and self.total_frames > 0:
+                # If we have both the current frame and the total number of frames, then we can easily calculate the %
+                _percent = math.trunc(self.frame / self.total_frames * 100)
+            elif self.time > 0 and self.duration and self.duration > 0:
+                # If that was not successful, we need to resort to assuming the percent by the duration and the time
+                # passed so far
+                _percent = math.trunc(self.time / self.duration * 100)
+            if _percent and _percent > int(self.percent):
+                self.percent = str(min(_percent, 100))
+
+        return {
+            'percent': self.percent,
+            'speed': self.speed,
+            'fps': self.fps,
+            'bitrate': self.bitrate,
+            'eta': self.eta(),
+        }
+
+    def eta(self):
+        """
+        Estimated remaining seconds, based on the current speed of the encode.
+
+        :return:
+        """
+        if not self.duration or self.speed <= 0:
+            return None
+        return max(0.0, (self.duration - self.time) / self.speed)
+
+    @staticmethod
+    def frame_rate_to_float(frame_rate):
+        """
+        Converts a frame rate from the probe, e.g. '24000/1001', into a float
+
+        :param frame_rate:
+        :return:
+        """
+        num, _, den = frame_rate.partition('/')
+        if den:
+            return float(num) / float(den)
+        return float(num)
+
+    @staticmethod
+    def time_string_to_seconds(time_string):
+        """
+        Converts a time string from the FFmpeg output, e.g. '01:02:03.45', into seconds
+
+        :param time_string:
+        :return:
+        """
+        hours, minutes, seconds = time_string.split(':')
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
@@ -26,6 +26,7 @@ import mimetypes
 import os
 import shutil
 import subprocess
+import threading
 from logging import Logger
 
 from .mimetype_overrides import MimetypeOverrides
@@ -50,7 +51,7 @@ def ffprobe_cmd(params):
     :param params:
     :return:
     """
-    command = ["ffprobe"] + params
+    command = [_get_context().ffprobe or "ffprobe"] + params
 
     pipe = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     out, err = pipe.communicate()
@@ -104,6 +105,46 @@ def ffprobe_file(vid_file_path):
     return info
 
 
+class _ProbeContext(object):
+    """
+    Process wide state of all Probe objects, set up by the first one
+
+    The mimetype list and our overrides are loaded once and flattened into a map of lower case extensions to the
+    category of their mimetype, e.g. '.mkv' -> 'video'.
+    """
+
+    def __init__(self):
+        self.ffprobe = shutil.which('ffprobe')
+
+        # Init (reset) our mimetype list
+        mimetypes.init()
+
+        # Add mimetype overrides to mimetype dictionary (replaces any existing entries)
+        mimetype_overrides = MimetypeOverrides()
+        all_mimetype_overrides = mimetype_overrides.get_all()
+        for extension in all_mimetype_overrides:
+            mimetypes.add_type(all_mimetype_overrides.get(extension), extension)
+
+        self.categories = {}
+        for extension, mimetype in mimetypes.types_map.items():
+            self.categories.setdefault(extension.lower(), mimetype.split('/')[0])
+
+
+_context = None
+_context_lock = threading.Lock()
+
+
+def _get_context():
+    global _context
+    with _context_lock:
+        if _context is None:
+            _context = _ProbeContext()
+        elif _context.ffprobe is None:
+            # installed since
+            _context.ffprobe = shutil.which('ffprobe')
+        return _context
+
+
 class Probe(object):
     """
     Probe
@@ -113,7 +154,8 @@ class Probe(object):
 
     def __init__(self, logger: Logger, allowed_mimetypes=None):
         # Ensure ffprobe is installed
-        if shutil.which('ffprobe') is None:
+        self.context = _get_context()
+        if self.context.ffprobe is None:
             raise Exception("Unable to find executable 'ffprobe'. Please ensure that FFmpeg is installed correctly.")
 
         self.logger = logger
@@ -121,15 +163,6 @@ class Probe(object):
             allowed_mimetypes = ['audio', 'video', 'image']
         self.allowed_mimetypes = allowed_mimetypes
 
-        # Init (reset) our mimetype list
-        mimetypes.init()
-
-        # Add mimetype overrides to mimetype dictionary (replaces any existing entries)
-        mimetype_overrides = MimetypeOverrides()
-        all_mimetype_overrides = mimetype_overrides.get_all()
-        for extension in all_mimetype_overrides:
-            mimetypes.add_type(all_mimetype_overrides.get(extension), extension)
-
     def __test_valid_mimetype(self, file_path):
         """
         Test the given file path for its mimetype.
@@ -141,15 +174,14 @@ class Probe(object):
         :return:
         """
         # Only run this check against video/audio/image MIME types
-        file_type = mimetypes.guess_type(file_path)[0]
+        file_type_category = self.context.categories.get(os.path.splitext(file_path)[1].lower())
 
         # If the file has no MIME type then it cannot be tested
-        if file_type is None:
+        if file_type_category is None:
             self.logger.debug("Unable to fetch file MIME type - '{}'".format(file_path))
             return False
 
         # Make sure the MIME type is either audio, video or image
-        file_type_category = file_type.split('/')[0]
         if file_type_category not in self.allowed_mimetypes:
             self.logger.debug("File MIME type not in [{}] - '{}'".format(', '.join(self.allowed_mimetypes), file_path))
             return False
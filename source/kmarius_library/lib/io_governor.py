@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from . import logger
+
+# Limits the number of processes reading media files concurrently, per device (st_dev). Without coordination, several
+# file testers probing files on the same spinning disk cause seek storms, while disks of a multi-disk library idle.
+# The limit can be changed with the UNMANIC_MAX_READERS_PER_DEVICE environment variable.
+
+DEFAULT_MAX_READERS = 2
+
+_lock = threading.Lock()
+
+
+def _get_max_readers_from_env() -> int:
+    value = os.getenv('UNMANIC_MAX_READERS_PER_DEVICE')
+    if not value:
+        return DEFAULT_MAX_READERS
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.error(f"Invalid UNMANIC_MAX_READERS_PER_DEVICE value '{value}'")
+        return DEFAULT_MAX_READERS
+
+
+_max_readers = _get_max_readers_from_env()
+
+
+class _Device:
+    def __init__(self, dev: int):
+        self.dev = dev
+        self.cond = threading.Condition(_lock)
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.num_reads = 0
+        self.wait_time = 0.0
+
+
+_devices: Dict[int, _Device] = {}
+
+
+def _get_device(path: str) -> Optional[_Device]:
+    try:
+        dev = os.stat(path).st_dev
+    except OSError:
+        # let the caller fail on the missing file
+        return None
+    with _lock:
+        if dev not in _devices:
+            _devices[dev] = _Device(dev)
+        return _devices[dev]
+
+
+def set_max_readers(max_readers: int):
+    global _max_readers
+    with _lock:
+        _max_readers = max(1, int(max_readers))
+        for device in _devices.values():
+            device.cond.notify_all()
+
+
+def get_max_readers() -> int:
+    return _max_readers
+
+
+@contextmanager
+def reading(path: str) -> Iterator[None]:
+    '''Context manager that blocks until a read slot on the device of path is available.'''
+    device = _get_device(path)
+    if device is None:
+        yield
+        return
+
+    t0 = time.time()
+    with device.cond:
+        device.waiting += 1
+        device.max_waiting = max(device.max_waiting, device.waiting)
+        while device.active >= _max_readers:
+            device.cond.wait()
+        device.waiting -= 1
+        device.active += 1
+        device.num_reads += 1
+        device.wait_time += time.time() - t0
+    try:
+        yield
+    finally:
+        with device.cond:
+            device.active -= 1
+            device.cond.notify()
+
+
+def get_stats() -> list[dict]:
+    '''Queue depth metrics for all devices that have been read from.'''
+    with _lock:
+        return [{
+            'device': device.dev,
+            'max_readers': _max_readers,
+            'active': device.active,
+            'waiting': device.waiting,
+            'max_waiting': device.max_waiting,
+            'num_reads': device.num_reads,
+            'average_wait': device.wait_time / device.num_reads if device.num_reads else 0.0,
+        } for device in _devices.values()]
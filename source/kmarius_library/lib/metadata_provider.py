@@ -5,7 +5,7 @@ from typing import Optional
 
 from kmarius_library.lib.ffmpeg.probe import Probe
 from .mp4box import MP4Box
-from . import logger
+from . import logger, io_governor
 
 
 class MetadataProvider:
@@ -34,8 +34,9 @@ class FFprobeProvider(MetadataProvider):
     @staticmethod
     def run_prog(path: str) -> Optional[dict]:
         probe = Probe(logger)
-        if not probe.file(path):
-            return None
+        with io_governor.reading(path):
+            if not probe.file(path):
+                return None
         return probe.get_probe()
 
 
@@ -47,9 +48,10 @@ class MediaInfoProvider(MetadataProvider):
     def run_prog(path: str) -> Optional[dict]:
         try:
             command = ['mediainfo', '--output=JSON', path]
-            pipe = subprocess.Popen(
-                command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-            out, err = pipe.communicate()
+            with io_governor.reading(path):
+                pipe = subprocess.Popen(
+                    command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                out, err = pipe.communicate()
 
             return json.loads(out.decode('utf-8'))
         except Exception as e:
@@ -64,7 +66,8 @@ class MP4BoxProvider(MetadataProvider):
     @staticmethod
     def run_prog(path: str) -> Optional[dict]:
         try:
-            return MP4Box.probe(path, logger=logger)
+            with io_governor.reading(path):
+                return MP4Box.probe(path, logger=logger)
         except Exception as e:
             logger.error(e)
             return None
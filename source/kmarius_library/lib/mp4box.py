@@ -312,6 +312,9 @@ class MP4BoxInfoxParser:
             self._logger.error(f"Could not parse info line: '{line}'")
 
 
+_PROGRESS = re.compile(r'^\s*([^:|]*?):?\s*\|[^|]*\|\s*\((\d+)/100\)')
+
+
 class MP4Box:
     @staticmethod
     def probe(path, logger=None) -> dict | None:
@@ -324,16 +327,25 @@ class MP4Box:
         """Build MP4Box command to add interleaving to a file."""
         return ['MP4Box', '-inter', str(param), file_in, '-out', file_out]
 
+    @staticmethod
+    def build_remux_command(file_in: str, file_out: str, param: int, remove_track_ids: list[int]) -> list[str]:
+        """Build MP4Box command that removes tracks and interleaves the file in the same write."""
+        command = ['MP4Box', '-inter', str(param)]
+        for track_id in remove_track_ids:
+            command += ['-rem', str(track_id)]
+        return command + [file_in, '-out', file_out]
+
     @staticmethod
     def parse_progress(line: str):
         """Parse output of MP4Box interleaving command."""
-        percent = 100
-
         # ISO File Writing: |=================== | (99/100)
-        match = re.search(r'\((\d+)/100\)', line)
-        if match:
-            percent = int(match.group(1))
+        match = _PROGRESS.search(line)
+        if match is None:
+            return {
+                'percent': 100
+            }
 
         return {
-            'percent': percent
+            'percent': int(match.group(2)),
+            'stage': match.group(1),
         }
\ No newline at end of file
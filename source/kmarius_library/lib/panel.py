@@ -13,8 +13,7 @@ from unmanic.libs.frontend_push_messages import FrontendPushMessages
 from unmanic.libs.libraryscanner import LibraryScannerManager
 from unmanic.libs.unmodels import Libraries
 
-from . import timestamps, logger, get_files_tested, cache
-from .metadata_provider import PROVIDERS
+from . import timestamps, logger, get_files_tested, cache, io_governor
 from .types import *
 
 
@@ -422,8 +421,8 @@ class Panel:
                 distinct.add(path)
 
         count = 0
-        for provider in PROVIDERS:
-            count += cache.reset_many(provider.name, distinct)
+        for table in cache.get_tables():
+            count += cache.reset_many(table, distinct)
         logger.info(f'Reset {count} metadata items')
 
     def _update_timestamps(self, items: list[dict]):
@@ -530,6 +529,10 @@ class Panel:
                     data['content'] = self._get_subtree(arguments)
                 case '/libraries', 'GET':
                     data['content'] = self._get_libraries()
+                case '/io/stats', 'GET':
+                    data['content'] = {
+                        'devices': io_governor.get_stats(),
+                    }
                 case '/timestamp/reset', 'POST':
                     self._reset_timestamps(_unpack_items(body))
                 case '/timestamp/update', 'POST':
@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from . import cache, logger
+from .metadata_provider import MetadataProvider, PROVIDERS
+
+# Shared access to ffprobe/mediainfo/MP4Box results for all kmarius plugins. Results are looked up in the metadata
+# cache of this plugin, keyed by path, mtime and file size, and only probed (under the I/O governor) on a miss. This
+# way a file is probed at most once per modification, no matter how many plugins look at it.
+
+_providers: dict[str, type[MetadataProvider]] = {p.name: p for p in PROVIDERS}
+
+# Results seen during file tests are also kept in memory, so that the worker processing the file minutes later can
+# skip both the probe and the database. Entries are validated against the exact size and mtime of the file, so a
+# worker whose input was rewritten by an earlier plugin in the chain probes it again. Results of files being tested
+# are staged in a small LRU, and moved to a second one, sized like the task queue, once the file is queued (see
+# keep). Most tested files are never queued and must not push out the queued ones. The results are stored as compact
+# JSON, about a tenth of the size of the parsed dicts.
+MAX_HANDOFF_ENTRIES = 512
+
+# matches the task data kept by kmarius_executor, queues longer than this lose the oldest entries
+MAX_QUEUED_ENTRIES = 20000
+
+_Entry = tuple[int, int, dict[str, str]]
+
+_handoff: OrderedDict[str, _Entry] = OrderedDict()
+_queued: OrderedDict[str, _Entry] = OrderedDict()
+_handoff_lock = threading.Lock()
+
+
+def _stat(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def _handoff_get(name: str, path: str, st: os.stat_result) -> Optional[dict]:
+    with _handoff_lock:
+        for entries in (_queued, _handoff):
+            entry = entries.get(path)
+            if entry is None:
+                continue
+            size, mtime_ns, results = entry
+            if size != st.st_size or mtime_ns != st.st_mtime_ns:
+                del entries[path]
+                continue
+            if name in results:
+                return json.loads(results[name])
+    return None
+
+
+def _handoff_put(name: str, path: str, st: os.stat_result, result: dict):
+    value = json.dumps(result, separators=(',', ':'))
+    with _handoff_lock:
+        entries, limit = (_queued, MAX_QUEUED_ENTRIES) if path in _queued else (_handoff, MAX_HANDOFF_ENTRIES)
+        entry = entries.get(path)
+        if entry is None or entry[0] != st.st_size or entry[1] != st.st_mtime_ns:
+            entry = (st.st_size, st.st_mtime_ns, {})
+            entries[path] = entry
+        entry[2][name] = value
+        entries.move_to_end(path)
+        while len(entries) > limit:
+            entries.popitem(last=False)
+
+
+def keep(path: str):
+    '''Keep the in-memory results for path until it is processed, call when the file is queued.'''
+    with _handoff_lock:
+        entry = _handoff.pop(path, None)
+        if entry is None:
+            return
+        _queued[path] = entry
+        _queued.move_to_end(path)
+        while len(_queued) > MAX_QUEUED_ENTRIES:
+            _queued.popitem(last=False)
+
+
+def forget(path: str):
+    '''Drop the in-memory results for path, e.g. after it has been processed.'''
+    with _handoff_lock:
+        _handoff.pop(path, None)
+        _queued.pop(path, None)
+
+
+def lookup(name: str, path: str, reuse_connection=False) -> Optional[dict]:
+    '''Cached result of the provider for path, or None if there is none for the current version of the file.'''
+    st = _stat(path)
+    if st is None:
+        return None
+    result = _handoff_get(name, path, st)
+    if result is not None:
+        return result
+    cache.ensure_tables(_providers.keys())
+    result = cache.get(name, path, int(st.st_mtime), size=st.st_size, reuse_connection=reuse_connection)
+    if result is not None:
+        _handoff_put(name, path, st, result)
+    return result
+
+
+def refresh(name: str, path: str, persist=True, reuse_connection=False) -> Optional[dict]:
+    '''Run the provider on path and store the result in the cache if persist is set.'''
+    provider = _providers[name]
+    if not provider.is_admissible(path):
+        return None
+    st = _stat(path)
+    if st is None:
+        return None
+    result = provider.run_prog(path)
+    if result is not None and persist:
+        cache.ensure_tables(_providers.keys())
+        cache.put(name, path, int(st.st_mtime), result, size=st.st_size, reuse_connection=reuse_connection)
+        _handoff_put(name, path, st, result)
+    return result
+
+
+def get(name: str, path: str, persist=True, reuse_connection=False) -> Optional[dict]:
+    '''
+    Result of the provider for path, from the cache if possible. Set persist=False for transient files, e.g. files in
+    a task's cache directory, so that they don't end up in the database.
+    '''
+    if persist:
+        result = lookup(name, path, reuse_connection=reuse_connection)
+        if result is not None:
+            return result
+        logger.debug(f'No cached {name} data found, probing - {path}')
+    return refresh(name, path, persist=persist, reuse_connection=reuse_connection)
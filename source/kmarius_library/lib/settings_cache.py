@@ -0,0 +1,125 @@
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from unmanic.libs.unplugins.settings import PluginSettings
+
+# PluginSettings reads and parses the settings file on every get_setting, and file tests construct new settings objects
+# per file. The values of a plugin and library are cached here instead and reloaded when the settings file changes.
+# The files are only checked every TTL seconds, so most file tests do no settings I/O at all. Values can be fetched
+# pre-parsed, the result of a parser is cached until the settings change.
+
+TTL = 5.0
+'''seconds after which the settings files are checked for changes'''
+
+
+def parse_list(value: str) -> list[str]:
+    '''Comma separated list, stripped, without empty items.'''
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def parse_extensions(value: str) -> Optional[frozenset[str]]:
+    '''Comma separated extensions without leading dots, lower case. None if empty, i.e. all are allowed.'''
+    extensions = frozenset(item.lstrip('.').lower() for item in parse_list(value))
+    return extensions or None
+
+
+def parse_patterns(value: str) -> list[re.Pattern]:
+    '''Regular expressions, one per line. Empty lines and lines starting with # are skipped.'''
+    patterns = []
+    for line in (value or '').splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            patterns.append(re.compile(line))
+    return patterns
+
+
+def parse_percentage(value) -> float:
+    '''A fraction from a percentage with an optional % sign, e.g. '5', '0.5%' or 5.'''
+    return float(str(value).strip().rstrip('%').strip()) / 100
+
+
+class CachedSettings:
+    '''The values of a settings object, reloaded only when its file changes.'''
+
+    def __init__(self, settings: PluginSettings):
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.values: Optional[dict] = None
+        self.parsed: dict[tuple[str, Callable], Any] = {}
+        self.stamp = None
+        self.checked = 0.0
+
+    def _get_stamp(self) -> tuple:
+        # the library settings file takes precedence, settings.json is used until it exists
+        directory = self.settings.get_profile_directory()
+        names = ['settings.json']
+        if self.settings.library_id:
+            names.insert(0, f'settings.{self.settings.library_id}.json')
+        stamp = ()
+        for name in names:
+            try:
+                st = os.stat(os.path.join(directory, name))
+                stamp += ((st.st_mtime_ns, st.st_size),)
+            except FileNotFoundError:
+                stamp += (None,)
+        return stamp
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self.values is not None and now - self.checked < TTL:
+            return
+        with self.lock:
+            if self.values is not None and now - self.checked < TTL:
+                return
+            stamp = self._get_stamp()
+            if self.values is None or stamp != self.stamp:
+                self.values = dict(self.settings.get_setting())
+                self.parsed = {}
+                # reading may have created the file
+                self.stamp = self._get_stamp() if None in stamp else stamp
+            self.checked = now
+
+    def invalidate(self):
+        self.values = None
+
+    def get_setting(self, key=None):
+        self._refresh()
+        if key is None:
+            return self.values
+        return self.values.get(key)
+
+    def get_parsed(self, key: str, parse: Callable[[Any], Any]):
+        '''The value of a setting passed through parse, which is only called again when the settings change.'''
+        self._refresh()
+        parsed = self.parsed
+        if (key, parse) not in parsed:
+            parsed[(key, parse)] = parse(self.values.get(key))
+        return parsed[(key, parse)]
+
+    def get_int(self, key: str) -> int:
+        return self.get_parsed(key, int)
+
+    def get_float(self, key: str) -> float:
+        return self.get_parsed(key, float)
+
+    def get_list(self, key: str) -> list[str]:
+        return self.get_parsed(key, parse_list)
+
+
+_cache: dict[tuple[str, Optional[int]], CachedSettings] = {}
+_lock = threading.Lock()
+
+
+def get(settings_class: type[PluginSettings], library_id: int = None) -> CachedSettings:
+    '''Cached settings of a plugin and library, replaced when the plugin is reloaded.'''
+    library_id = int(library_id) if library_id else None
+    key = (f'{settings_class.__module__}.{settings_class.__qualname__}', library_id)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is None or type(cached.settings) is not settings_class:
+            cached = CachedSettings(settings_class(library_id=library_id))
+            _cache[key] = cached
+        return cached
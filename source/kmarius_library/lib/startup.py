@@ -0,0 +1,49 @@
+import threading
+import time
+from typing import Callable
+
+from . import logger
+
+# Unmanic imports all plugins at startup (kmarius_hacks even forces it), so anything done at import time delays it.
+# Databases are set up when they are first used, and their maintenance (checkpoint, optimize, VACUUM) runs on a
+# background thread.
+
+# A full VACUUM holds the write lock of a database until it is done, which can take minutes for a large one. Connections
+# to databases maintained in the background wait this long for the lock instead of sqlite's default of 5 seconds.
+BUSY_TIMEOUT = 600
+
+
+class LazyInit:
+    '''Runs an init function once, on first use, in whichever thread gets there first.'''
+
+    def __init__(self, name: str, func: Callable[[], None]):
+        self.name = name
+        self.func = func
+        self.lock = threading.Lock()
+        self.done = False
+
+    def __call__(self):
+        if self.done:
+            return
+        with self.lock:
+            if self.done:
+                return
+            t0 = time.perf_counter()
+            self.func()
+            self.done = True
+            logger.debug(f'Initialized {self.name} in {(time.perf_counter() - t0) * 1000:.0f}ms')
+
+
+def run_in_background(name: str, func: Callable[[], None]):
+    '''Run e.g. database maintenance without blocking the caller, errors are logged.'''
+
+    def run():
+        t0 = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            logger.error(f'{name} failed: {e}')
+            return
+        logger.debug(f'{name} finished in {time.perf_counter() - t0:.1f}s')
+
+    threading.Thread(target=run, name=name, daemon=True).start()
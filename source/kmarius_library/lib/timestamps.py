@@ -6,7 +6,7 @@ from typing import Dict, Tuple, Callable, Collection
 
 from unmanic.libs import common
 
-from . import logger, PLUGIN_ID
+from . import logger, PLUGIN_ID, startup
 
 DB_PATH = os.path.join(common.get_home_dir(), '.unmanic', 'userdata', PLUGIN_ID, 'timestamps.db')
 
@@ -15,12 +15,13 @@ _local = threading.local()
 
 # NOTE: only reuse in short-lived threads like FileTester
 def _get_connection(reuse_connection=False) -> sqlite3.Connection:
+    _ensure_init()
     if reuse_connection:
         if not hasattr(_local, 'connection'):
-            _local.connection = sqlite3.connect(DB_PATH)
+            _local.connection = sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT)
         return _local.connection
     else:
-        return sqlite3.connect(DB_PATH)
+        return sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT)
 
 
 def _check_column_exists(conn: sqlite3.Connection, table_name: str, column_name: str):
@@ -64,7 +65,7 @@ def _init():
             logger.info(f'Migrating database from kmarius_incremental_scan_db')
             os.rename(old_db, DB_PATH)
 
-    with _get_connection() as conn:
+    with sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT) as conn:
         cur = conn.cursor()
         if not _check_column_exists(conn, 'timestamps', 'library_id'):
             logger.info("Table 'timestamps' does not exists or is missing the 'library_id' column. (Re-)creating...")
@@ -87,10 +88,15 @@ def _init():
 
         cur.execute('CREATE INDEX IF NOT EXISTS idx_last_update ON timestamps (last_update)')
 
-        _perform_maintenance(cur)
+    startup.run_in_background(f'{PLUGIN_ID}-timestamps-maintenance', _maintain)
+
+
+def _maintain():
+    with sqlite3.connect(DB_PATH, timeout=startup.BUSY_TIMEOUT) as conn:
+        _perform_maintenance(conn.cursor())
 
 
-_init()
+_ensure_init = startup.LazyInit('timestamps', _init)
 
 
 def put(library_id: int, path: str, mtime: int, reuse_connection=False):
@@ -1,18 +1,20 @@
 import os
 import re
 import time
-from typing import override
+from typing import Optional, override
 
 from unmanic.libs.library import Libraries, Library
 from unmanic.libs.unplugins.settings import PluginSettings
 
-from kmarius_library.lib import cache, timestamps, logger, PLUGIN_ID, get_files_tested, add_file_tested, \
-    remove_file_tested, add_file_seen, get_files_seen
+from kmarius_library.lib import cache, probes, timestamps, settings_cache, logger, PLUGIN_ID, get_files_tested, \
+    add_file_tested, remove_file_tested, add_file_seen, get_files_seen
 from kmarius_library.lib.metadata_provider import MetadataProvider, PROVIDERS
 from kmarius_library.lib.panel import Panel
 from kmarius_library.lib.types import *
 from kmarius_library.lib.timestamps import reset_oldest
 
+_load_start = time.perf_counter()
+
 cache.init([p.name for p in PROVIDERS])
 
 
@@ -137,14 +139,14 @@ class Settings(PluginSettings):
 class CombinedSettings:
     def __init__(self):
         self.settings = {}
-        self.configured_for = []
-        self._allowed_extensions = {}
-        self._ignored_path_patterns = {}
-        for lib in Libraries().select().where(Libraries.enable_remote_only == False):
-            self.configured_for.append(lib.id)
+        # the libraries are only queried on first use, this is created when the plugin is loaded
+        self.configured_for = None
 
     def is_valid(self) -> bool:
         '''Check whether the configuration is still valid. If not, it should be re-created.'''
+        if self.configured_for is None:
+            self.configured_for = [lib.id for lib in Libraries().select().where(Libraries.enable_remote_only == False)]
+            return True
         for lib in Libraries().select().where(Libraries.enable_remote_only == False):
             if not lib.id in self.configured_for:
                 return False
@@ -160,16 +162,8 @@ class CombinedSettings:
             self.settings[library_id] = Settings(library_id=library_id)
         return self.settings[library_id].get_setting(key)
 
-    def get_allowed_extensions(self, library_id: int) -> list[str]:
-        if library_id not in self._allowed_extensions:
-            settings = Settings(library_id=library_id)
-            extensions = settings.get_setting('extensions').split(',')
-            extensions = [ext.strip().lstrip('.') for ext in extensions]
-            extensions = [ext for ext in extensions if ext != '']
-            if not extensions:
-                extensions = None
-            self._allowed_extensions[library_id] = extensions
-        return self._allowed_extensions[library_id]
+    def get_allowed_extensions(self, library_id: int) -> Optional[frozenset[str]]:
+        return settings_cache.get(Settings, library_id).get_parsed('extensions', settings_cache.parse_extensions)
 
     def is_extension_allowed(self, library_id: int, path: str) -> bool:
         extensions = self.get_allowed_extensions(library_id)
@@ -179,16 +173,7 @@ class CombinedSettings:
         return ext in extensions
 
     def get_ignored_path_patterns(self, library_id: int) -> list[re.Pattern]:
-        if library_id not in self._ignored_path_patterns:
-            settings = Settings(library_id=library_id)
-            patterns = []
-            for regex_pattern in settings.get_setting('ignored_paths').splitlines():
-                regex_pattern = regex_pattern.strip()
-                if regex_pattern and not regex_pattern.startswith('#'):
-                    pattern = re.compile(regex_pattern)
-                    patterns.append(pattern)
-            self._ignored_path_patterns[library_id] = patterns
-        return self._ignored_path_patterns[library_id]
+        return settings_cache.get(Settings, library_id).get_parsed('ignored_paths', settings_cache.parse_patterns)
 
     def is_path_ignored(self, library_id: int, path: str) -> bool:
         regex_patterns = self.get_ignored_path_patterns(library_id)
@@ -201,20 +186,19 @@ class CombinedSettings:
 panel = Panel(CombinedSettings)
 combined_settings = CombinedSettings()
 
+logger.debug(f'Loaded in {(time.perf_counter() - _load_start) * 1000:.0f}ms')
+
 
 def update_cached_metadata(providers: list[MetadataProvider], path: str):
     try:
-        mtime = int(os.path.getmtime(path))
-
         for p in providers:
-            if cache.exists(p.name, path, mtime):
+            if probes.lookup(p.name, path) is not None:
                 continue
 
-            metadata = p.run_prog(path)
+            metadata = probes.refresh(p.name, path)
 
             if metadata is not None:
                 logger.info(f'Updating {p.name} data - {path}')
-                cache.put(p.name, path, mtime, metadata)
     except Exception as e:
         logger.error(e)
 
@@ -228,7 +212,7 @@ def update_timestamp(library_id: int, path: str):
 
 
 def on_library_management_file_test(data: FileTestData, **kwargs):
-    settings = Settings(library_id=data.get('library_id'))
+    settings = settings_cache.get(Settings, data.get('library_id'))
     path = data['path']
     library_id = data['library_id']
 
@@ -259,7 +243,6 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
         add_file_tested(library_id, path, mtime)
 
     if settings.get_setting('caching_enabled'):
-        mtime = int(os.path.getmtime(path))
         quiet = settings.get_setting('quiet_caching')
 
         for provider in PROVIDERS:
@@ -268,16 +251,14 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
             if not provider.is_admissible(path):
                 continue
 
-            metadata = cache.get(provider.name, path, mtime, reuse_connection=True)
+            metadata = probes.lookup(provider.name, path, reuse_connection=True)
 
             if metadata is not None:
                 if not quiet:
                     logger.info(f'Cached {provider.name} data found - {path}')
             else:
                 logger.info(f'No cached {provider.name} data found, refreshing - {path}')
-                metadata = provider.run_prog(path)
-                if metadata is not None:
-                    cache.put(provider.name, path, mtime, metadata, reuse_connection=True)
+                metadata = probes.refresh(provider.name, path, reuse_connection=True)
 
             if metadata is not None:
                 data['shared_info'][provider.name] = metadata
@@ -286,7 +267,7 @@ def on_library_management_file_test(data: FileTestData, **kwargs):
 def on_postprocessor_task_results(data: TaskResultData, **kwargs):
     if data['task_processing_success'] and data['file_move_processes_success']:
         library_id = data['library_id']
-        settings = Settings(library_id=library_id)
+        settings = settings_cache.get(Settings, library_id)
         incremental_scan_enabled = settings.get_setting('incremental_scan_enabled')
         caching_enabled = settings.get_setting('caching_enabled')
 
@@ -302,6 +283,9 @@ def on_postprocessor_task_results(data: TaskResultData, **kwargs):
             # TODO: this happens because we are not moving unchanged files to cache and back
             paths = [data['source_data']['abspath']]
 
+        # the probe results handed from the file test to the workers are stale now
+        probes.forget(data['source_data']['abspath'])
+
         for path in paths:
             if combined_settings.is_extension_allowed(library_id, path):
                 if caching_enabled:
@@ -343,8 +327,8 @@ def _prune_metadata(fraction=1.0):
     all_paths = set(timestamps.get_all_paths())
 
     num_pruned = 0
-    for provider in PROVIDERS:
-        num_pruned += cache.check_oldest(provider.name, fraction, lambda path: path in all_paths)
+    for table in cache.get_tables():
+        num_pruned += cache.check_oldest(table, fraction, lambda path: path in all_paths)
     logger.info(f'Pruned {num_pruned} metadata items')
 
 
@@ -361,9 +345,7 @@ def emit_scan_start(data: dict, **kwargs):
     settings = Settings(library_id=library_id)
 
     reset_old_timestamps = settings.get_setting('reset_old_timestamps')
-    percent = settings.get_setting('check_old_timestamps')
-    percent = percent.strip().rstrip('%').strip()
-    frac = float(percent) / 100
+    frac = settings_cache.parse_percentage(settings.get_setting('check_old_timestamps'))
 
     if reset_old_timestamps:
         num = reset_oldest(library_id, frac)
@@ -380,6 +362,8 @@ def emit_file_queued(data: dict, **kwargs):
     # remove file from the list of tested files; we update these at the end of the scan,
     # this one is updated after processing
     remove_file_tested(library_id, path)
+    # the worker picks up the probe results from the file test
+    probes.keep(path)
 
 
 def emit_scan_complete(data: dict, **kwargs):
@@ -410,8 +394,6 @@ def emit_scan_complete(data: dict, **kwargs):
         logger.info(f'Prune duration: {t1 - t0:.2f} seconds')
 
     if settings.get_setting('caching_enabled'):
-        percent = str(settings.get_setting('check_old_metadata'))
-        percent = percent.strip().rstrip('%').strip()
-        frac = float(percent) / 100
+        frac = settings_cache.parse_percentage(settings.get_setting('check_old_metadata'))
 
         _prune_metadata(frac)
\ No newline at end of file
@@ -5,18 +5,14 @@ from kmarius_executor.lib import init_task_data
 def on_library_management_file_test(data: FileTestData, **kwargs):
     task_data = init_task_data(data)
 
+    plan = task_data['plan']
+
     for stream_type in ['attachment', 'data']:
         streams = task_data['streams'][stream_type]
-        mappings = {}
 
         # remove all streams
         for idx, stream_info in enumerate(streams):
-            mappings[idx] = {
-                'stream_mapping': [],
-                'stream_encoding': [],
-            }
-
-        task_data['mappings'][stream_type] = mappings
+            plan.drop(stream_type, idx)
 
-        if mappings:
+        if streams:
             task_data['add_file_to_pending_tasks'] = True
\ No newline at end of file
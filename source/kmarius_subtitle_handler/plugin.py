@@ -3,9 +3,10 @@ import os
 
 from unmanic.libs.unplugins.settings import PluginSettings
 
-from kmarius_executor.lib import init_task_data
+from kmarius_executor.lib import init_task_data, task_store
+from kmarius_library.lib import probes, settings_cache
 
-from kmarius_subtitle_handler.lib.ffmpeg import StreamMapper, Parser, Probe
+from kmarius_library.lib.ffmpeg import StreamMapper, Parser, Probe
 from kmarius_subtitle_handler.lib.types import *
 from kmarius_subtitle_handler.lib import logger
 
@@ -22,6 +23,27 @@ class Settings(PluginSettings):
     }
 
 
+def _parse_languages(language_list: str) -> list[str]:
+    language_list = re.sub(r'\s', '-', language_list)
+    languages = list(filter(None, language_list.lower().split(',')))
+    return [language.strip() for language in languages]
+
+
+def _get_languages(settings: settings_cache.CachedSettings) -> list[str]:
+    return settings.get_parsed('languages_to_extract', _parse_languages)
+
+
+def _get_subtitle_tag(language_tag: str, index: int) -> str:
+    # If there were no tags, just number the file
+    subtitle_tag = f'.{language_tag}' if language_tag else f'.{index}'
+    # Ensure subtitle tag does not contain whitespace or slashes
+    return re.sub(r'\s|/|\\', '-', subtitle_tag)
+
+
+def _is_text_subtitle(codec_name: str) -> bool:
+    return codec_name.lower() in ['srt', 'subrip', 'mov_text']
+
+
 class PluginStreamMapper(StreamMapper):
     def __init__(self):
         super(PluginStreamMapper, self).__init__(logger, ['subtitle'])
@@ -33,15 +55,12 @@ class PluginStreamMapper(StreamMapper):
         self.settings = settings
 
         # update languages list
-        language_list = self.settings.get_setting('languages_to_extract')
-        language_list = re.sub(r'\s', '-', language_list)
-        languages = list(filter(None, language_list.lower().split(',')))
-        self.languages = [language.strip() for language in languages]
+        self.languages = _get_languages(settings)
 
     def test_stream_needs_processing(self, stream_info: dict):
         '''Any text based will need to be processed'''
 
-        if stream_info.get('codec_name', '').lower() not in ['srt', 'subrip', 'mov_text']:
+        if not _is_text_subtitle(stream_info.get('codec_name', '')):
             return False
 
         # If no languages specified, extract all
@@ -68,18 +87,7 @@ class PluginStreamMapper(StreamMapper):
             }
 
         # Find a tag for this subtitle
-        subtitle_tag = ''
-
-        if language_tag:
-            subtitle_tag = '{}.{}'.format(subtitle_tag, language_tag)
-
-        # If there were no tags, just number the file
-        if not subtitle_tag:
-            subtitle_tag = '{}.{}'.format(
-                subtitle_tag, stream_info.get('index'))
-
-        # Ensure subtitle tag does not contain whitespace or slashes
-        subtitle_tag = re.sub(r'\s|/|\\', '-', subtitle_tag)
+        subtitle_tag = _get_subtitle_tag(language_tag, stream_info.get('index'))
 
         self.sub_streams.append(
             {
@@ -124,23 +132,25 @@ class PluginStreamMapper(StreamMapper):
 def on_library_management_file_test(data: FileTestData, **kwargs):
     task_data = init_task_data(data)
 
+    settings = settings_cache.get(Settings, data.get('library_id'))
+    languages = _get_languages(settings)
+
+    plan = task_data['plan']
     subtitle_streams = task_data['streams']['subtitle']
-    subtitle_mappings = {}
 
-    # remove all streams
+    # remove all streams, text subtitles are extracted to .srt files by the executor in the same pass
     for idx, stream_info in enumerate(subtitle_streams):
-        subtitle_mappings[idx] = {
-            'stream_mapping': [],
-            'stream_encoding': [],
-        }
+        plan.drop('subtitle', idx)
+        if _is_text_subtitle(stream_info.codec_name):
+            if not languages or stream_info.language in languages:
+                plan.extract('subtitle', idx, f'{_get_subtitle_tag(stream_info.language, stream_info.index)}.srt')
 
-    task_data['mappings']['subtitle'] = subtitle_mappings
-    if subtitle_mappings:
+    if subtitle_streams:
         task_data['add_file_to_pending_tasks'] = True
 
 
 def on_worker_process(data: ProcessItemData, **kwargs):
-    settings = Settings(library_id=data.get('library_id'))
+    settings = settings_cache.get(Settings, data.get('library_id'))
 
     # Default to no FFMPEG command required. This prevents the FFMPEG command from running if it is not required
     data['exec_command'] = []
@@ -149,8 +159,14 @@ def on_worker_process(data: ProcessItemData, **kwargs):
     # Get the path to the file
     path = data.get('file_in')
 
+    task_data = task_store.get(data.get('library_id'), data.get('original_file_path'))
+    if task_data is not None and task_data['plan'].sidecars:
+        # the executor extracts the subtitles while writing its output
+        return
+
     probe = Probe(logger, allowed_mimetypes=['video'])
-    if not probe.file(path):
+    probe_info = probes.get('ffprobe', path, persist=path == data.get('original_file_path'))
+    if probe_info is None or not probe.set_probe(probe_info):
         return
 
     mapper = PluginStreamMapper()
@@ -171,7 +187,7 @@ def on_worker_process(data: ProcessItemData, **kwargs):
         for sub_stream in mapper.sub_streams:
             stream_mapping = sub_stream.get('stream_mapping', [])
             subtitle_tag = sub_stream.get('subtitle_tag')
-            subtitle_path = os.path.join(original_file_directory, f'{original_stem}.{subtitle_tag}.srt')
+            subtitle_path = os.path.join(original_file_directory, f'{original_stem}{subtitle_tag}.srt')
 
             ffmpeg_args += stream_mapping
             ffmpeg_args += ['-y', subtitle_path]
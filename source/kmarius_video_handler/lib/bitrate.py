@@ -0,0 +1,156 @@
+import os
+import subprocess
+from typing import Optional
+
+from kmarius_executor.lib.streams import StreamSummary, all_streams
+from kmarius_library.lib import cache, io_governor, probes
+
+from . import logger
+
+# Finds the bitrate of a video stream, cheapest source first:
+#   1. bit_rate reported by ffprobe, or the BPS tag written by mkvmerge (already part of the stream summary)
+#   2. results of earlier calls, stored in the metadata cache of the library plugin
+#   3. the sample tables of an mp4, as reported by MP4Box, or the bitrate of a cached mediainfo probe
+#   4. file size and duration, minus the nominal bitrates of the other streams
+#   5. mkvinfo -t, which reads the whole file, for Matroska files only
+# Results of 3-5 are cached, including failures, so that mkvinfo runs at most once per version of a file.
+
+TABLE = 'bitrate'
+cache.register_table(TABLE)
+
+# muxing overhead of the container, relative to the file size
+CONTAINER_OVERHEAD = 0.01
+
+# nominal bitrates of lossy audio codecs that commonly lack a bitrate in mkv. lossless codecs (truehd, flac, dts-hd
+# which ffprobe reports as dts) vary too much, those files are left to mkvinfo
+NOMINAL_AUDIO_BITRATES = {
+    'aac': 96_000,
+    'ac3': 448_000,
+    'eac3': 640_000,
+    'mp3': 192_000,
+    'opus': 64_000,
+    'vorbis': 128_000,
+}
+'''per channel for aac, opus and vorbis, per stream otherwise'''
+PER_CHANNEL = {'aac', 'opus', 'vorbis'}
+
+
+def _is_matroska(path: str) -> bool:
+    ext = os.path.splitext(path)[1][1:].lower()
+    return ext in ['mkv', 'webm']
+
+
+def _from_mp4box(stream: StreamSummary, path: str) -> Optional[int]:
+    mp4box = probes.get('mp4box', path, reuse_connection=True)
+    if mp4box is None:
+        return None
+    # tracks of an mp4 are listed in the same order by ffprobe and MP4Box
+    tracks = mp4box.get('tracks', [])
+    if stream.index >= len(tracks):
+        return None
+    track = tracks[stream.index]
+    if track.get('size') and track.get('samples_duration'):
+        return int(track['size'] * 8 * 1000 / track['samples_duration'])
+    if 'average_rate' in track:
+        return int(track['average_rate'])
+    return None
+
+
+def _from_mediainfo(stream: StreamSummary, path: str) -> Optional[int]:
+    # only if it has been probed anyway, mediainfo is as slow as mkvinfo on files without statistics tags
+    mediainfo = probes.lookup('mediainfo', path, reuse_connection=True)
+    if mediainfo is None:
+        return None
+    for track in mediainfo.get('media', {}).get('track', []):
+        if track.get('@type') == 'Video' and track.get('StreamOrder') == str(stream.index):
+            try:
+                return int(float(track['BitRate']))
+            except (KeyError, ValueError):
+                return None
+    return None
+
+
+def _nominal_bitrate(stream: StreamSummary) -> Optional[int]:
+    if stream.bit_rate is not None:
+        return stream.bit_rate
+    match stream.codec_type:
+        case 'subtitle' | 'attachment' | 'data':
+            return 0
+        case 'audio' if stream.codec_name in NOMINAL_AUDIO_BITRATES:
+            bit_rate = NOMINAL_AUDIO_BITRATES[stream.codec_name]
+            if stream.codec_name in PER_CHANNEL:
+                bit_rate *= stream.channels or 2
+            return bit_rate
+    return None
+
+
+def _from_size(stream: StreamSummary, streams: dict[str, tuple[StreamSummary, ...]], duration: Optional[float],
+               size: int) -> Optional[int]:
+    if not duration:
+        return None
+    remaining = size * 8 * (1 - CONTAINER_OVERHEAD) / duration
+    for other in all_streams(streams):
+        if other.index == stream.index:
+            continue
+        bit_rate = _nominal_bitrate(other)
+        if bit_rate is None:
+            return None
+        remaining -= bit_rate
+    return int(remaining) if remaining > 0 else None
+
+
+def _from_mkvinfo(stream: StreamSummary, path: str) -> Optional[int]:
+    with io_governor.reading(path):
+        proc = subprocess.Popen(['mkvinfo', '-t', path], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        # Example:
+        # Statistics for track number 1: number of blocks: 138031; size in bytes: 2127736369; duration in seconds: 5757.041708333; approximate bitrate in bits/second: 2956707
+        pattern = bytes(f'Statistics for track number {stream.index + 1}:', 'utf-8')
+        try:
+            for line in proc.stdout:
+                if line.startswith(pattern):
+                    line = line.decode('utf-8').strip()
+                    return int(line.split()[-1])
+        finally:
+            proc.terminate()
+            proc.wait()
+    return None
+
+
+def _discover(stream: StreamSummary, streams: dict[str, tuple[StreamSummary, ...]], path: str,
+              duration: Optional[float], size: int) -> tuple[Optional[int], str]:
+    bit_rate = _from_mp4box(stream, path)
+    if bit_rate is not None:
+        return bit_rate, 'mp4box'
+    bit_rate = _from_mediainfo(stream, path)
+    if bit_rate is not None:
+        return bit_rate, 'mediainfo'
+    bit_rate = _from_size(stream, streams, duration, size)
+    if bit_rate is not None:
+        return bit_rate, 'size'
+    if _is_matroska(path):
+        return _from_mkvinfo(stream, path), 'mkvinfo'
+    return None, 'none'
+
+
+def get_bitrate(stream: StreamSummary, streams: dict[str, tuple[StreamSummary, ...]], path: str,
+                duration: Optional[float]) -> Optional[int]:
+    if stream.bit_rate is not None:
+        return stream.bit_rate
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    mtime = int(st.st_mtime)
+
+    cached = cache.get(TABLE, path, mtime, size=st.st_size, reuse_connection=True) or {}
+    key = str(stream.index)
+    if key in cached:
+        return cached[key]['bit_rate']
+
+    bit_rate, source = _discover(stream, streams, path, duration, st.st_size)
+    logger.debug(f'Bitrate of stream {stream.index} from {source}: {bit_rate} - {path}')
+
+    cached[key] = {'bit_rate': bit_rate, 'source': source}
+    cache.put(TABLE, path, mtime, cached, size=st.st_size, reuse_connection=True)
+    return bit_rate
@@ -0,0 +1,179 @@
+import json
+import os
+import re
+import subprocess
+import threading
+from typing import NamedTuple, Optional
+
+from unmanic.libs import common
+
+from . import logger, PLUGIN_ID
+
+# Chooses the encoder, preset and threading for h264 transcodes. Presets are picked from a table of single-threaded
+# 1080p throughput per preset. The defaults below are rough numbers for a modern AVX2 CPU; scripts/calibrate_x264.py
+# measures the actual numbers on this machine and writes them to CALIBRATION_PATH.
+
+CALIBRATION_PATH = os.path.join(common.get_home_dir(), '.unmanic', 'userdata', PLUGIN_ID, 'x264_calibration.json')
+
+# preset -> frames per second of a single thread encoding 1080p, ordered from fastest to best quality
+DEFAULT_PRESET_FPS = {
+    'ultrafast': 90.0,
+    'superfast': 60.0,
+    'veryfast': 40.0,
+    'faster': 26.0,
+    'fast': 20.0,
+    'medium': 15.0,
+    'slow': 9.0,
+    'slower': 4.5,
+    'veryslow': 2.0,
+}
+
+# slowest preset chosen automatically, the implicit default of x264. slower presets cost a lot of throughput for little
+# quality and need to be allowed explicitly
+DEFAULT_SLOWEST_PRESET = 'medium'
+
+# x264 without AVX2 is considerably slower
+NO_AVX2_FACTOR = 0.6
+
+# additional threads don't scale linearly
+THREAD_EFFICIENCY = 0.85
+
+REFERENCE_PIXELS = 1920 * 1080
+
+# in order of preference
+H264_ENCODERS = ['libx264', 'libopenh264']
+
+_lock = threading.Lock()
+_encoders: Optional[set[str]] = None
+_cpu: Optional['CpuInfo'] = None
+_calibration: Optional[tuple[float, dict[str, float]]] = None
+
+
+class CpuInfo(NamedTuple):
+    cores: int
+    avx: bool
+    avx2: bool
+    avx512: bool
+
+
+class EncoderChoice(NamedTuple):
+    codec: str
+    preset: Optional[str]
+    threads: int
+    x264_params: Optional[str]
+    expected_speed: Optional[float]
+
+    def options(self) -> dict[str, str]:
+        '''Per-stream ffmpeg options, to be passed to MappingPlan.encode.'''
+        options = {'threads': str(self.threads)}
+        if self.preset:
+            options['preset'] = self.preset
+        if self.x264_params:
+            options['x264-params'] = self.x264_params
+        return options
+
+
+def get_encoders() -> set[str]:
+    '''Names of the video encoders ffmpeg was built with, queried once per process.'''
+    global _encoders
+    with _lock:
+        if _encoders is None:
+            _encoders = set()
+            try:
+                proc = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'], capture_output=True, timeout=30)
+                # e.g. " V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC ..."
+                for line in proc.stdout.decode('utf-8', errors='replace').splitlines():
+                    match = re.match(r'^\s*V[A-Z.]{5}\s+(\S+)', line)
+                    if match:
+                        _encoders.add(match.group(1))
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.error(f'Could not list ffmpeg encoders: {e}')
+        return _encoders
+
+
+def get_cpu_info() -> CpuInfo:
+    global _cpu
+    if _cpu is None:
+        try:
+            cores = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cores = os.cpu_count() or 1
+        flags = set()
+        try:
+            with open('/proc/cpuinfo') as f:
+                for line in f:
+                    if line.startswith('flags'):
+                        flags = set(line.split(':', 1)[1].split())
+                        break
+        except OSError:
+            pass
+        _cpu = CpuInfo(cores, 'avx' in flags, 'avx2' in flags, 'avx512f' in flags)
+    return _cpu
+
+
+def get_preset_fps() -> dict[str, float]:
+    '''Calibrated single-thread 1080p throughput per preset, or the defaults adjusted for the CPU.'''
+    global _calibration
+    try:
+        mtime = os.path.getmtime(CALIBRATION_PATH)
+        if _calibration is None or _calibration[0] != mtime:
+            with open(CALIBRATION_PATH) as f:
+                presets = {preset: float(fps) for preset, fps in json.load(f)['presets'].items()}
+            _calibration = (mtime, presets)
+        return _calibration[1]
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f'Could not read {CALIBRATION_PATH}: {e}')
+
+    factor = 1.0 if get_cpu_info().avx2 else NO_AVX2_FACTOR
+    return {preset: fps * factor for preset, fps in DEFAULT_PRESET_FPS.items()}
+
+
+def _parse_frame_rate(frame_rate: Optional[str]) -> Optional[float]:
+    if not frame_rate:
+        return None
+    num, _, den = frame_rate.partition('/')
+    try:
+        rate = float(num) / float(den) if den else float(num)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return rate if rate > 0 else None
+
+
+def choose_h264_encoder(width: Optional[int], height: Optional[int], frame_rate: Optional[str],
+                        concurrent_workers: int, target_speed: float,
+                        slowest_preset: str = DEFAULT_SLOWEST_PRESET) -> EncoderChoice:
+    '''
+    Pick the slowest (best quality) x264 preset up to slowest_preset that still encodes at target_speed times realtime
+    when the CPU is shared by concurrent_workers encodes, or the fastest preset if none does.
+    '''
+    cpu = get_cpu_info()
+    threads = max(1, cpu.cores // max(1, concurrent_workers))
+
+    encoders = get_encoders()
+    codec = next((encoder for encoder in H264_ENCODERS if encoder in encoders), None)
+    if codec is None:
+        # ffmpeg could not be queried or has no h264 encoder, let ffmpeg report the error
+        logger.warning('No h264 encoder found, falling back to libx264')
+        codec = 'libx264'
+    if codec != 'libx264':
+        return EncoderChoice(codec, None, threads, None, None)
+
+    pixels = width * height if width and height else REFERENCE_PIXELS
+    fps = _parse_frame_rate(frame_rate) or 24.0
+    thread_factor = 1 + (threads - 1) * THREAD_EFFICIENCY
+
+    preset_fps = get_preset_fps()
+    presets = [preset for preset in DEFAULT_PRESET_FPS if preset in preset_fps]
+    if slowest_preset in presets:
+        presets = presets[:presets.index(slowest_preset) + 1]
+    chosen, speed = None, None
+    for preset in presets:
+        expected_speed = preset_fps[preset] * thread_factor * REFERENCE_PIXELS / pixels / fps
+        if chosen is None or expected_speed >= target_speed:
+            chosen, speed = preset, expected_speed
+
+    # a few lookahead threads per encode are enough, the default of threads/6 starves small thread counts
+    x264_params = f'lookahead-threads={max(1, threads // 4)}' if concurrent_workers > 1 else None
+    return EncoderChoice(codec, chosen, threads, x264_params, speed)
@@ -1,18 +1,22 @@
-import subprocess
-import re
 from typing import Optional
 
 from unmanic.libs.unplugins.settings import PluginSettings
 
 from kmarius_executor.lib import init_task_data
-from kmarius_video_handler.lib import logger
+from kmarius_executor.lib.plan import MappingPlan
+from kmarius_executor.lib.streams import StreamSummary
+from kmarius_video_handler.lib import logger, encoders, bitrate
 from kmarius_video_handler.lib.types import *
+from kmarius_library.lib import settings_cache
 
 
 class Settings(PluginSettings):
     settings = {
         'target_bitrate': 3000,
         'bitrate_cutoff': 4500,
+        'concurrent_workers': 1,
+        'target_speed': 1.0,
+        'slowest_preset': encoders.DEFAULT_SLOWEST_PRESET,
     }
     form_settings = {
         'target_bitrate': {
@@ -23,88 +27,86 @@ class Settings(PluginSettings):
             'label': 'Bitrate cutoff (kbit/s)',
             'description': "Won't re-encode if current bitrate is smaller than this value.",
         },
+        'concurrent_workers': {
+            'label': 'Number of workers encoding at the same time',
+            'description': 'The CPU threads are split between the workers.',
+        },
+        'target_speed': {
+            'label': 'Target encoding speed (multiple of realtime)',
+            'description': 'The x264 preset with the best quality that is expected to reach this speed is used, but '
+                           'not one slower than the slowest preset.',
+        },
+        'slowest_preset': {
+            'label': 'Slowest x264 preset',
+            'description': 'Slower presets only improve the quality a little, but can reduce the throughput '
+                           'considerably.',
+            'input_type': 'select',
+            'select_options': [{'value': preset, 'label': preset} for preset in encoders.DEFAULT_PRESET_FPS],
+        },
     }
 
 
-def _get_bitrate(stream_info: dict, path: str) -> Optional[int]:
-    if 'bit_rate' in stream_info:
-        return int(stream_info['bit_rate'])
-    if 'tags' in stream_info:
-        for key, val in stream_info['tags'].items():
-            if key.startswith('BPS'):
-                return int(val)
-    stream_index = stream_info['index']
-    proc = subprocess.Popen(['mkvinfo', '-t', path], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    # Example:
-    # Statistics for track number 1: number of blocks: 138031; size in bytes: 2127736369; duration in seconds: 5757.041708333; approximate bitrate in bits/second: 2956707
-    pattern = bytes(f'Statistics for track number {stream_index + 1}:', 'utf-8')
-    for line in proc.stdout:
-        if line.startswith(pattern):
-            proc.terminate()
-            line = line.decode('utf-8').strip()
-            return int(line.split()[-1])
-    return None
-
-
 # change everything that is not 8bit h264 with a reasonable bit rate
-def needs_encoding(stream_info: dict, path: str, bitrate_cutoff: int) -> bool:
-    if stream_info['codec_name'] != 'h264':
+def needs_encoding(stream_info: StreamSummary, streams: dict[str, tuple[StreamSummary, ...]], path: str,
+                   duration: Optional[float], bitrate_cutoff: int) -> bool:
+    if stream_info.codec_name != 'h264':
         return True
 
-    bit_rate = _get_bitrate(stream_info, path)
+    bit_rate = bitrate.get_bitrate(stream_info, streams, path, duration)
     if bit_rate is None:
         logger.error(f'Could not determine bitrate for {path}')
 
     if bit_rate is not None and bit_rate > bitrate_cutoff:
         return True
 
-    if 'pix_fmt' in stream_info and stream_info['pix_fmt'] != 'yuv420p':
+    if stream_info.pix_fmt is not None and stream_info.pix_fmt != 'yuv420p':
         return True
 
     return False
 
 
-def video_stream_mapping(
-        stream_info: dict, idx: int, path: str,
-        target_bitrate: int, bitrate_cutoff: int) -> Optional[dict]:
+# returns True if the stream is changed
+def plan_video_stream(
+        plan: MappingPlan, stream_info: StreamSummary, idx: int, path: str,
+        streams: dict[str, tuple[StreamSummary, ...]], duration: Optional[float],
+        target_bitrate: int, bitrate_cutoff: int, concurrent_workers: int, target_speed: float,
+        slowest_preset: str) -> bool:
     # remove images
-    codec_name = stream_info['codec_name']
+    codec_name = stream_info.codec_name
     if codec_name in ['png', 'mjpeg']:
-        return {
-            'stream_mapping': [],
-            'stream_encoding': [],
-        }
+        plan.drop('video', idx)
+        return True
 
-    if needs_encoding(stream_info, path, bitrate_cutoff):
-        stream_encoding = [
-            f'-c:v:{idx}', 'libx264',
-            '-pix_fmt', 'yuv420p',
-            f'-b:v:{idx}', f'{target_bitrate}'
-        ]
-        return {
-            'stream_mapping': ['-map', f'0:v:{idx}'],
-            'stream_encoding': stream_encoding,
-        }
+    if needs_encoding(stream_info, streams, path, duration, bitrate_cutoff):
+        choice = encoders.choose_h264_encoder(stream_info.width, stream_info.height, stream_info.avg_frame_rate,
+                                              concurrent_workers, target_speed, slowest_preset)
+        logger.info(f'Encoding video stream {idx} with {choice.codec} preset={choice.preset} '
+                    f'threads={choice.threads} expected_speed={choice.expected_speed} - {path}')
+        plan.encode('video', idx, choice.codec, pix_fmt='yuv420p', b=f'{target_bitrate}', **choice.options())
+        return True
 
-    return None
+    return False
 
 
 def on_library_management_file_test(data: FileTestData, **kwargs):
     task_data = init_task_data(data)
 
-    settings = Settings(library_id=data.get('library_id'))
+    settings = settings_cache.get(Settings, data.get('library_id'))
     target_bitrate = settings.get_setting('target_bitrate') * 1000
     bitrate_cutoff = settings.get_setting('bitrate_cutoff') * 1000
+    concurrent_workers = int(settings.get_setting('concurrent_workers'))
+    target_speed = float(settings.get_setting('target_speed'))
+    slowest_preset = settings.get_setting('slowest_preset')
 
+    plan: MappingPlan = task_data['plan']
     video_streams = task_data['streams']['video']
-    video_mappings = {}
+    changed = False
 
     path = data['path']
     for idx, stream_info in enumerate(video_streams):
-        mapping = video_stream_mapping(stream_info, idx, path, target_bitrate, bitrate_cutoff)
-        if mapping is not None:
-            video_mappings[idx] = mapping
+        changed |= plan_video_stream(plan, stream_info, idx, path, task_data['streams'], task_data['duration'],
+                                     target_bitrate, bitrate_cutoff, concurrent_workers, target_speed,
+                                     slowest_preset)
 
-    task_data['mappings']['video'] = video_mappings
-    if video_mappings:
+    if changed:
         task_data['add_file_to_pending_tasks'] = True
\ No newline at end of file